@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Pure helpers for advancedsettings.xml: no xbmc imports, so they run against
+fixture files outside Kodi (tools/advancedsettings_check.py).
+
+merge() updates only the nodes given in `updates` and keeps everything else
+(other sections, unknown tags, comments) as it was.
+"""
+import re
+import difflib
+import xml.etree.ElementTree as ET
+
+MB = 1024 * 1024
+
+# (od kolika MB RAM, název, <cache>) -- Kodi drží v RAM až 3x memorysize
+CACHE_PRESETS = [
+    (0,    "low",       {"memorysize": 20 * MB,  "buffermode": 1, "readfactor": 4}),
+    (1536, "medium",    {"memorysize": 50 * MB,  "buffermode": 1, "readfactor": 8}),
+    (3072, "high",      {"memorysize": 100 * MB, "buffermode": 1, "readfactor": 10}),
+    (6144, "very_high", {"memorysize": 200 * MB, "buffermode": 1, "readfactor": 20}),
+]
+
+# Timeouty pro streamování z NAS (sekundy)
+NETWORK_TIMEOUTS = {
+    "curlclienttimeout": 30,
+    "curllowspeedtime": 30,
+    "curlretries": 2,
+    "nfstimeout": 30,
+}
+
+
+def parse_meminfo(text):
+    """MemTotal from /proc/meminfo content, in MB, or None."""
+    m = re.search(r"^MemTotal:\s*(\d+)\s*kB", text or "", re.M)
+    return int(m.group(1)) // 1024 if m else None
+
+
+def parse_memory_label(text):
+    """MB from an info label such as System.Memory(total) ("3855MB", "3.8 GB"), or None."""
+    m = re.search(r"([\d.,]+)\s*([KMG])i?B", text or "", re.I)
+    if not m:
+        return None
+    try:
+        value = float(m.group(1).replace(",", "."))
+    except ValueError:
+        return None
+    factor = {"K": 1.0 / 1024, "M": 1, "G": 1024}[m.group(2).upper()]
+    return int(value * factor)
+
+
+def cache_preset(total_mb, name="auto"):
+    """(preset name, <cache> values) for a preset name, or picked from RAM for "auto"."""
+    if name != "auto":
+        for _, pname, values in CACHE_PRESETS:
+            if pname == name:
+                return pname, dict(values)
+        raise ValueError(f"unknown cache preset: {name}")
+    chosen = CACHE_PRESETS[0]
+    for preset in CACHE_PRESETS:
+        if total_mb is not None and total_mb >= preset[0]:
+            chosen = preset
+    return chosen[1], dict(chosen[2])
+
+
+def db_section(host, port, user, pw, name):
+    return {"type": "mysql", "host": host, "port": port, "user": user, "pass": pw, "name": name}
+
+
+def build_updates(db=None, cache=None, timeouts=None, videolibrary=None):
+    """Nested {section: {tag: value}} for merge(); None parts are left out."""
+    updates = {}
+    if db:
+        updates["videodatabase"] = db["video"]
+        updates["musicdatabase"] = db["music"]
+    if videolibrary:
+        updates["videolibrary"] = videolibrary
+    if cache:
+        updates["cache"] = cache
+    if timeouts:
+        updates["network"] = timeouts
+    return updates
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _parse(xml_text):
+    # Komentáře v existujícím souboru zachovat
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+    return ET.fromstring(xml_text, parser=parser)
+
+
+def _apply(elem, updates):
+    for tag, value in updates.items():
+        child = elem.find(tag)
+        if child is None:
+            child = ET.SubElement(elem, tag)
+        if isinstance(value, dict):
+            _apply(child, value)
+        else:
+            child.text = _text(value)
+
+
+def _indent(elem, level=0):
+    # ET.indent() až od Pythonu 3.9
+    pad = "\n" + "  " * level
+    children = list(elem)
+    if children:
+        if not (elem.text or "").strip():
+            elem.text = pad + "  "
+        for child in children:
+            _indent(child, level + 1)
+            if not (child.tail or "").strip():
+                child.tail = pad + "  "
+        children[-1].tail = pad
+
+
+def merge(existing_xml, updates):
+    """Return advancedsettings.xml text with `updates` applied to `existing_xml`.
+
+    `existing_xml` may be empty (no file yet). Raises ValueError when it is
+    not well-formed or not an <advancedsettings> document, so a broken file
+    is never replaced blindly.
+    """
+    if existing_xml and existing_xml.strip():
+        try:
+            root = _parse(existing_xml)
+        except ET.ParseError as e:
+            raise ValueError(f"advancedsettings.xml is not valid XML: {e}")
+        if root.tag != "advancedsettings":
+            raise ValueError(f"unexpected root element <{root.tag}>")
+    else:
+        root = ET.Element("advancedsettings")
+    _apply(root, updates)
+    _indent(root)
+    return ET.tostring(root, encoding="unicode") + "\n"
+
+
+def has_section(xml_text, tag):
+    """True when `xml_text` (may be empty or broken) has a top-level <tag>."""
+    if not xml_text or not xml_text.strip():
+        return False
+    try:
+        return _parse(xml_text).find(tag) is not None
+    except ET.ParseError:
+        return False
+
+
+def diff(old_text, new_text, name="advancedsettings.xml"):
+    """Unified diff of two versions, "" when they are equal."""
+    return "".join(difflib.unified_diff(
+        (old_text or "").splitlines(True), new_text.splitlines(True),
+        fromfile=f"{name} (current)", tofile=f"{name} (new)"))
+
+
+PASS_RE = re.compile(r"(<pass>)[^<]*(</pass>)")
+
+
+def mask_passwords(text):
+    """Hide <pass> values before showing a diff on screen.
+
+    The masked lines would all read the same, so a "+" line whose password
+    differs from the matching "-" line is marked as changed. Passwords that
+    are only added (new section) have no "-" line and stay unmarked.
+    """
+    removed = [m.group(0) for m in (PASS_RE.search(ln) for ln in text.splitlines()
+                                    if ln.startswith("-") and not ln.startswith("---")) if m]
+    added = 0
+    out = []
+    for ln in text.splitlines(True):
+        m = PASS_RE.search(ln)
+        if m and ln.startswith("+") and not ln.startswith("+++"):
+            changed = added < len(removed) and removed[added] != m.group(0)
+            added += 1
+            ln = PASS_RE.sub(r"\1*****\2", ln)
+            if changed:
+                ln = ln.rstrip("\n") + "  <!-- password changed -->" + ("\n" if ln.endswith("\n") else "")
+            out.append(ln)
+        else:
+            out.append(PASS_RE.sub(r"\1*****\2", ln))
+    return "".join(out)
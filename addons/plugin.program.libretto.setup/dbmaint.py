@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Index advisor and maintenance for the shared MyVideos database.
+
+The queries behind nextsmartlists and the library views look up resume
+points by file (bookmark), watched state (files.playCount, lastPlayed) and
+the episodes of one show in season/episode order. advise() compares the
+existing indexes (SQLite PRAGMA index_list/index_info, MySQL
+information_schema.STATISTICS) with RECOMMENDED; apply() creates the
+missing ones and refreshes the statistics (ANALYZE, optionally OPTIMIZE).
+time_queries() runs the same access patterns before and after.
+
+Works on any DB-API connection to a MyVideos database; no xbmc imports,
+tools/myvideos_fixture.py --maintain runs it on a generated SQLite fixture.
+"""
+import time
+import statistics
+
+# (tabulka, sloupce, proč)
+RECOMMENDED = [
+    ("bookmark", ("idFile", "type"), "resume points of a file (in-progress episodes)"),
+    ("files", ("playCount",), "watched / unwatched filters"),
+    ("files", ("lastPlayed",), "recently played order and change checks"),
+    ("episode", ("idShow", "c12", "c13"), "episodes of one show in season/episode order"),
+]
+TABLES = sorted({t for t, _, _ in RECOMMENDED})
+INDEX_PREFIX = "ix_libretto_"
+# MySQL indexuje TEXT sloupce jen s délkou prefixu
+TEXT_PREFIX = 16
+MYSQL_PREFIX_NOTE = (
+    f"MySQL: c12/c13 are TEXT, so episode(idShow, c12, c13) is created with {TEXT_PREFIX} character\n"
+    "prefixes. It narrows the lookup to one show, but MySQL cannot read a prefix index in\n"
+    "order: ORDER BY c12, c13 still sorts the show's episodes (a filesort).")
+TIMING_REPEAT = 3
+SAMPLE_SHOWS = 25
+
+
+def existing_indexes(conn, dialect, schema=None, tables=TABLES):
+    """{table: [(index name, [columns], unique)]} for the given tables."""
+    cur = conn.cursor()
+    out = {t: [] for t in tables}
+    if dialect == "sqlite":
+        for t in tables:
+            cur.execute(f"PRAGMA index_list({t})")
+            for row in cur.fetchall():
+                name, unique = row[1], bool(row[2])
+                cur.execute(f"PRAGMA index_info('{name}')")
+                cols = [r[2] for r in sorted(cur.fetchall())]
+                out[t].append((name, cols, unique))
+        return out
+    marks = ", ".join(["%s"] * len(tables))
+    cur.execute("SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+                f"WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({marks}) "
+                "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX", [schema] + list(tables))
+    found = {}
+    for table, name, non_unique, col in cur.fetchall():
+        entry = found.setdefault((table, name), ([], not int(non_unique)))
+        entry[0].append(col)
+    for (table, name), (cols, unique) in found.items():
+        out.setdefault(table, []).append((name, cols, unique))
+    return out
+
+
+def column_types(conn, dialect, table, schema=None):
+    """{column: declared type (lower case)}."""
+    cur = conn.cursor()
+    if dialect == "sqlite":
+        cur.execute(f"PRAGMA table_info({table})")
+        return {r[1]: (r[2] or "").lower() for r in cur.fetchall()}
+    cur.execute("SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s", (schema, table))
+    return {name: (kind or "").lower() for name, kind in cur.fetchall()}
+
+
+def unused_indexes(conn, dialect, schema=None, tables=TABLES):
+    """[(table, index)] MySQL has not used since the server started; [] when unknown (SQLite)."""
+    if dialect == "sqlite":
+        return []
+    cur = conn.cursor()
+    marks = ", ".join(["%s"] * len(tables))
+    try:
+        cur.execute("SELECT OBJECT_NAME, INDEX_NAME FROM performance_schema.table_io_waits_summary_by_index_usage "
+                    f"WHERE OBJECT_SCHEMA = %s AND OBJECT_NAME IN ({marks}) "
+                    "AND INDEX_NAME IS NOT NULL AND INDEX_NAME <> 'PRIMARY' AND COUNT_STAR = 0",
+                    [schema] + list(tables))
+        return [tuple(r) for r in cur.fetchall()]
+    except Exception:
+        # performance_schema vypnuté nebo bez práv
+        return []
+
+
+def _lower(cols):
+    return [c.lower() for c in cols]
+
+
+def advise(indexes, recommended=RECOMMENDED):
+    """
+    Compare `indexes` (existing_indexes()) with the recommendations:
+      missing    [(table, columns, why)] with no index starting with these columns
+      present    [(table, columns, index name)]
+      redundant  [(table, index, covered by)]: a non-unique index that is a prefix of another one
+    """
+    missing, present, redundant = [], [], []
+    for table, cols, why in recommended:
+        want = _lower(cols)
+        hit = next((name for name, have, _ in indexes.get(table, [])
+                    if _lower(have)[:len(want)] == want), None)
+        if hit:
+            present.append((table, cols, hit))
+        else:
+            missing.append((table, cols, why))
+    for table, idx in indexes.items():
+        for name, cols, unique in idx:
+            if unique:
+                continue
+            for other, other_cols, _ in idx:
+                if other != name and len(other_cols) > len(cols) and _lower(other_cols)[:len(cols)] == _lower(cols):
+                    redundant.append((table, name, other))
+                    break
+    return {"missing": missing, "present": present, "redundant": redundant}
+
+
+def index_name(table, cols):
+    return INDEX_PREFIX + table + "_" + "_".join(c.lower() for c in cols)
+
+
+def create_sql(dialect, table, cols, types=None):
+    types = types or {}
+    parts = []
+    for c in cols:
+        kind = types.get(c, "")
+        if dialect == "mysql" and ("text" in kind or "blob" in kind):
+            parts.append(f"{c}({TEXT_PREFIX})")
+        else:
+            parts.append(c)
+    return f"CREATE INDEX {index_name(table, cols)} ON {table} ({', '.join(parts)})"
+
+
+def maintenance_sql(dialect, tables=TABLES, optimize=False):
+    if dialect == "sqlite":
+        # PRAGMA optimize jen přepočítá, co je potřeba; VACUUM je na živé DB příliš drahý
+        return ["ANALYZE", "PRAGMA optimize"]
+    stmts = [f"ANALYZE TABLE {', '.join(tables)}"]
+    if optimize:
+        stmts.append(f"OPTIMIZE TABLE {', '.join(tables)}")
+    return stmts
+
+
+def apply(conn, dialect, advice, schema=None, optimize=False):
+    """Create the missing indexes and refresh statistics. Returns [(statement, seconds)]."""
+    cur = conn.cursor()
+    done = []
+    statements = [create_sql(dialect, table, cols, column_types(conn, dialect, table, schema))
+                  for table, cols, _ in advice["missing"]]
+    for sql in statements + maintenance_sql(dialect, optimize=optimize):
+        t = time.perf_counter()
+        cur.execute(sql)
+        if cur.description:
+            cur.fetchall()   # ANALYZE/OPTIMIZE TABLE vrací tabulku výsledků
+        done.append((sql, time.perf_counter() - t))
+    conn.commit()
+    return done
+
+
+# ----- měření přístupových vzorů -----
+
+def _q_inprogress(cur):
+    cur.execute("SELECT episode.idEpisode FROM episode "
+                "JOIN bookmark ON bookmark.idFile = episode.idFile AND bookmark.type = 1")
+    cur.fetchall()
+
+
+def _q_unplayed(cur):
+    cur.execute("SELECT idFile FROM files WHERE playCount IS NULL OR playCount = 0")
+    cur.fetchall()
+
+
+def _q_recent(cur):
+    cur.execute("SELECT idFile, lastPlayed FROM files WHERE lastPlayed IS NOT NULL "
+                "ORDER BY lastPlayed DESC LIMIT 50")
+    cur.fetchall()
+
+
+def _q_show_episodes(cur):
+    cur.execute(f"SELECT DISTINCT idShow FROM episode ORDER BY idShow LIMIT {SAMPLE_SHOWS}")
+    for (sid,) in cur.fetchall():
+        cur.execute(f"SELECT idEpisode FROM episode WHERE idShow = {int(sid)} ORDER BY c12, c13")
+        cur.fetchall()
+
+
+TIMED_QUERIES = [
+    ("in-progress (bookmark)", _q_inprogress),
+    ("unwatched files (playCount)", _q_unplayed),
+    ("recently played (lastPlayed)", _q_recent),
+    (f"episodes of {SAMPLE_SHOWS} shows (idShow, c12, c13)", _q_show_episodes),
+]
+
+
+def time_queries(conn, repeat=TIMING_REPEAT):
+    """{label: median ms} of the access patterns."""
+    cur = conn.cursor()
+    out = {}
+    for label, run in TIMED_QUERIES:
+        runs = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            run(cur)
+            runs.append(time.perf_counter() - t)
+        out[label] = round(statistics.median(runs) * 1000.0, 2)
+    return out
+
+
+def report(advice, before, after=None, executed=(), unused=(), dialect="sqlite"):
+    """Plain text report for a textviewer."""
+    lines = ["Recommended indexes:"]
+    for table, cols, name in advice["present"]:
+        lines.append(f"  ok       {table}({', '.join(cols)})  [{name}]")
+    for table, cols, why in advice["missing"]:
+        lines.append(f"  MISSING  {table}({', '.join(cols)})  - {why}")
+    if dialect == "mysql":
+        lines.append("")
+        lines.extend(MYSQL_PREFIX_NOTE.splitlines())
+    if advice["redundant"]:
+        lines.append("")
+        lines.append("Redundant indexes (prefix of another index):")
+        for table, name, other in advice["redundant"]:
+            lines.append(f"  {table}.{name}  covered by {other}")
+    if unused:
+        lines.append("")
+        lines.append("Indexes unused since the server started:")
+        for table, name in unused:
+            lines.append(f"  {table}.{name}")
+    if executed:
+        lines.append("")
+        lines.append("Executed:")
+        for sql, seconds in executed:
+            lines.append(f"  {seconds * 1000.0:8.1f} ms  {sql}")
+    lines.append("")
+    lines.append("Query timings (median ms):" if after is None else "Query timings (median ms, before -> after):")
+    for label, ms in before.items():
+        if after is None:
+            lines.append(f"  {ms:9.2f}  {label}")
+        else:
+            lines.append(f"  {ms:9.2f} -> {after.get(label, 0):9.2f}  {label}")
+    return "\n".join(lines)
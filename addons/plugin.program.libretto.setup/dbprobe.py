@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Latency probe for the shared MariaDB/MySQL server.
+
+Without a driver only TCP is used: every "ping" opens a connection and
+waits for the server greeting (the first packet of the MySQL protocol),
+which needs no credentials. With pymysql or mysql.connector installed the
+probe also logs in, times SELECT 1 round trips and one representative
+episode query against the newest MyVideos database.
+
+No xbmc imports; run it against any server from a shell:
+
+    python dbprobe.py 192.168.1.10 3306
+"""
+import sys
+import time
+import socket
+import statistics
+
+DEFAULT_PINGS = 5
+DEFAULT_TIMEOUT = 5.0
+
+# Výchozí prahy pro varování (ms)
+WARN_CONNECT_MS = 50
+WARN_RTT_MS = 10
+WARN_QUERY_MS = 500
+
+# Typický dotaz Next-Up: nezhlédnuté epizody po seriálech
+EPISODE_QUERY = ("SELECT idShow, MIN(c12 * 1000 + c13) FROM episode_view "
+                 "WHERE playCount IS NULL OR playCount = 0 GROUP BY idShow")
+
+
+class ProbeError(Exception):
+    pass
+
+
+def read_packet(sock):
+    """One MySQL protocol packet: 3 byte length, sequence number, payload."""
+    head = _read_exact(sock, 4)
+    length = head[0] | (head[1] << 8) | (head[2] << 16)
+    return _read_exact(sock, length)
+
+
+def _read_exact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ProbeError("connection closed before the server greeting")
+        data += chunk
+    return data
+
+
+def parse_greeting(payload):
+    """Server version from a handshake packet; raises ProbeError for an error packet."""
+    if not payload:
+        raise ProbeError("empty greeting")
+    if payload[0] == 0xFF:
+        # Error packet: 0xff, 2 byte code, optional "#" + SQL state, message
+        # (e.g. "Host ... is not allowed to connect")
+        message = payload[9:] if payload[3:4] == b"#" else payload[3:]
+        raise ProbeError(message.decode("utf-8", "replace").strip())
+    if payload[0] != 10:
+        raise ProbeError(f"not a MySQL server (protocol {payload[0]})")
+    return payload[1:].split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def tcp_ping(host, port, timeout=DEFAULT_TIMEOUT):
+    """(connect seconds, greeting seconds, server version) of one connection."""
+    t0 = time.perf_counter()
+    try:
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+    except OSError as e:
+        raise ProbeError(f"cannot connect to {host}:{port}: {e}")
+    try:
+        t1 = time.perf_counter()
+        version = parse_greeting(read_packet(sock))
+        t2 = time.perf_counter()
+    except socket.timeout:
+        raise ProbeError("no server greeting within the timeout")
+    finally:
+        sock.close()
+    return t1 - t0, t2 - t1, version
+
+
+def connect_driver(host, port, user, pw, timeout):
+    """DB-API connection through pymysql or mysql.connector, or None when neither is installed."""
+    try:
+        import pymysql  # type: ignore
+        return "pymysql", pymysql.connect(host=host, port=int(port), user=user, password=pw,
+                                          connect_timeout=int(timeout))
+    except ImportError:
+        pass
+    try:
+        import mysql.connector  # type: ignore
+        return "mysql.connector", mysql.connector.connect(host=host, port=int(port), user=user, password=pw,
+                                                          connection_timeout=int(timeout))
+    except ImportError:
+        return None
+
+
+def newest_database(cur, base):
+    cur.execute("SHOW DATABASES LIKE %s", (base + "%",))
+    names = [r[0] for r in cur.fetchall()]
+    digits = lambda n: int("".join(c for c in n[len(base):] if c.isdigit()) or 0)
+    return max(names, key=digits) if names else None
+
+
+def driver_timings(host, port, user, pw, base, pings, timeout):
+    """{"driver", "rtt_ms", "query_ms", "database"} with a driver, None without one."""
+    found = connect_driver(host, port, user, pw, timeout)
+    if found is None:
+        return None
+    driver, conn = found
+    try:
+        cur = conn.cursor()
+        rtts = []
+        for _ in range(pings):
+            t = time.perf_counter()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            rtts.append(time.perf_counter() - t)
+        out = {"driver": driver, "rtt_ms": ms(statistics.median(rtts)), "query_ms": None, "database": None}
+        database = newest_database(cur, base)
+        if database:
+            cur.execute(f"USE `{database}`")
+            t = time.perf_counter()
+            cur.execute(EPISODE_QUERY)
+            cur.fetchall()
+            out["query_ms"] = ms(time.perf_counter() - t)
+            out["database"] = database
+        return out
+    finally:
+        conn.close()
+
+
+def ms(seconds):
+    return round(seconds * 1000.0, 1)
+
+
+def run(host, port=3306, user="", pw="", base="MyVideos", pings=DEFAULT_PINGS,
+        timeout=DEFAULT_TIMEOUT, query=True):
+    """
+    Probe the server. Returns a dict:
+      connect_ms  median TCP connect time
+      rtt_ms      median round trip: SELECT 1 with a driver, else the greeting
+      query_ms    EPISODE_QUERY on the newest `base` database (driver only, else None)
+      server, driver, database, pings, error (None when everything worked)
+    """
+    result = {"connect_ms": None, "rtt_ms": None, "query_ms": None, "server": "",
+              "driver": "", "database": None, "pings": 0, "error": None}
+    connects, greetings = [], []
+    try:
+        for _ in range(max(1, int(pings))):
+            c, g, result["server"] = tcp_ping(host, port, timeout)
+            connects.append(c)
+            greetings.append(g)
+    except ProbeError as e:
+        result["error"] = str(e)
+    if connects:
+        result["pings"] = len(connects)
+        result["connect_ms"] = ms(statistics.median(connects))
+        result["rtt_ms"] = ms(statistics.median(greetings))
+    if result["error"] or not query or not user:
+        return result
+    try:
+        timings = driver_timings(host, port, user, pw, base, max(1, int(pings)), timeout)
+    except Exception as e:
+        result["error"] = f"query failed: {e}"
+        return result
+    if timings:
+        result.update(timings)
+    return result
+
+
+def warnings(result, connect_ms=WARN_CONNECT_MS, rtt_ms=WARN_RTT_MS, query_ms=WARN_QUERY_MS):
+    """Human readable list of thresholds the result exceeds (empty = fine)."""
+    out = []
+    if result.get("error"):
+        out.append(result["error"])
+    for key, limit, label in (("connect_ms", connect_ms, "connect"), ("rtt_ms", rtt_ms, "round trip"),
+                              ("query_ms", query_ms, "episode query")):
+        value = result.get(key)
+        if value is not None and limit and value > limit:
+            out.append(f"{label} {value:.1f} ms > {limit} ms")
+    return out
+
+
+def summary(result):
+    parts = []
+    for key, label in (("connect_ms", "connect"), ("rtt_ms", "RTT"), ("query_ms", "query")):
+        if result.get(key) is not None:
+            parts.append(f"{label} {result[key]:.1f} ms")
+    if result.get("server"):
+        parts.append(result["server"])
+    return ", ".join(parts) or (result.get("error") or "")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.exit("usage: dbprobe.py HOST [PORT [USER [PASSWORD]]]")
+    res = run(args[0], *(args[1:4]))
+    print(summary(res))
+    for w in warnings(res):
+        print("warning:", w)
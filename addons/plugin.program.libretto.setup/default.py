@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Script entry point: RunScript(plugin.program.libretto.setup,maintenance)
+
+maintenance  index advisor for the video database (dbmaint.py): report,
+             create the missing indexes, ANALYZE/OPTIMIZE, timings before/after
+"""
+import os
+import sys
+import glob
+import sqlite3
+import xbmc
+import xbmcgui
+import xbmcvfs
+
+from service import ls, get_str, get_bool
+import dbprobe
+import dbmaint
+
+def log(msg, level=xbmc.LOGINFO):
+    xbmc.log(f"[Libretto] {msg}", level)
+
+def connect_video_db():
+    """
+    (connection, dialect, schema, label) of the video database: the shared
+    MySQL one from the settings, otherwise the newest local MyVideos*.db.
+    """
+    host = get_str("db_host", "")
+    if host:
+        port = get_str("db_port", "3306")
+        found = dbprobe.connect_driver(host, port, get_str("db_user", ""), get_str("db_pass", ""),
+                                       dbprobe.DEFAULT_TIMEOUT)
+        if found is None:
+            raise RuntimeError(ls(30011, "Chybí ovladač MySQL (pymysql nebo mysql.connector)"))
+        _, conn = found
+        cur = conn.cursor()
+        schema = dbprobe.newest_database(cur, get_str("videos_base", "MyVideos"))
+        if not schema:
+            conn.close()
+            raise RuntimeError(f"no {get_str('videos_base', 'MyVideos')}* database on {host}")
+        cur.execute(f"USE `{schema}`")
+        return conn, "mysql", schema, f"{host}:{port}/{schema}"
+    # Lokální SQLite: nejnovější verze schématu
+    base = xbmcvfs.translatePath("special://database/")
+    dbs = glob.glob(os.path.join(base, "MyVideos*.db"))
+    if not dbs:
+        raise RuntimeError("no MyVideos*.db in special://database/")
+    digits = lambda p: int("".join(c for c in os.path.basename(p) if c.isdigit()) or 0)
+    path = max(dbs, key=digits)
+    return sqlite3.connect(path, timeout=10), "sqlite", None, os.path.basename(path)
+
+def maintenance():
+    heading = ls(30009, "Údržba databáze")
+    try:
+        conn, dialect, schema, label = connect_video_db()
+    except Exception as e:
+        log(f"maintenance: {e}", xbmc.LOGWARNING)
+        xbmcgui.Dialog().ok(heading, str(e))
+        return
+    try:
+        advice = dbmaint.advise(dbmaint.existing_indexes(conn, dialect, schema))
+        unused = dbmaint.unused_indexes(conn, dialect, schema)
+        before = dbmaint.time_queries(conn)
+        xbmcgui.Dialog().textviewer(f"{heading}: {label}",
+                                    dbmaint.report(advice, before, unused=unused, dialect=dialect), usemono=True)
+        question = ls(30010, "Vytvořit chybějící indexy ({n}) a spustit ANALYZE?").replace(
+            "{n}", str(len(advice["missing"])))
+        if not xbmcgui.Dialog().yesno(heading, question):
+            return
+        busy = xbmcgui.DialogProgress()
+        busy.create(heading, label)
+        try:
+            executed = dbmaint.apply(conn, dialect, advice, schema, optimize=get_bool("maint_optimize", False))
+            after = dbmaint.time_queries(conn)
+        finally:
+            busy.close()
+        text = dbmaint.report(advice, before, after, executed, unused, dialect)
+        log(f"maintenance on {label}:\n{text}")
+        xbmcgui.Dialog().textviewer(f"{heading}: {label}", text, usemono=True)
+    except Exception as e:
+        log(f"maintenance failed: {e}", xbmc.LOGERROR)
+        xbmcgui.Dialog().ok(heading, str(e))
+    finally:
+        conn.close()
+
+ACTIONS = {
+    "maintenance": maintenance,
+}
+
+if __name__ == "__main__":
+    action = sys.argv[1] if len(sys.argv) > 1 else "maintenance"
+    ACTIONS.get(action, maintenance)()
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
+import json
+import time
 import xbmc
 import xbmcgui
 import xbmcaddon
 import xbmcvfs
 
+import advsettings
+import dbprobe
+
 ADDON = xbmcaddon.Addon()
 ADDON_ID = ADDON.getAddonInfo("id")
 
@@ -42,42 +47,76 @@ def set_bool(key, value):
     ADDON.setSetting(key, "true" if bool(value) else "false")
 
 # ----- core -----
-def write_advancedsettings():
+CACHE_PRESET_VALUES = ["auto", None, "low", "medium", "high", "very_high"]  # pořadí jako enum v settings.xml
+
+def total_ram_mb():
+    # /proc/meminfo na Linuxu/Androidu, jinak info label Kodi
+    try:
+        with open("/proc/meminfo", "r") as f:
+            mb = advsettings.parse_meminfo(f.read())
+        if mb:
+            return mb
+    except OSError:
+        pass
+    return advsettings.parse_memory_label(xbmc.getInfoLabel("System.Memory(total)"))
+
+def read_text(path):
+    if not xbmcvfs.exists(path):
+        return ""
+    f = xbmcvfs.File(path)
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def write_text(path, text):
+    f = xbmcvfs.File(path, 'w')
+    try:
+        f.write(text)
+    finally:
+        f.close()
+
+def settings_updates(current=""):
+    """
+    Nodes this addon manages in advancedsettings.xml, from the addon settings.
+    `current` is the existing file: "Auto" keeps a <cache> section already in it.
+    """
     host = get_str("db_host", "")
     port = get_str("db_port", "3306")
     user = get_str("db_user", "")
     pw   = get_str("db_pass", "")
     vbase= get_str("videos_base", "MyVideos")
     mbase= get_str("music_base", "MyMusic")
-    iw   = "true" if get_bool("import_watched", True) else "false"
-    ir   = "true" if get_bool("import_resume",  True) else "false"
 
-    if not host or not user:
-        return False, "Missing host/user"
+    try:
+        preset_name = CACHE_PRESET_VALUES[int(get_str("cache_preset", "0"))]
+    except (ValueError, IndexError):
+        preset_name = "auto"
+    cache = None
+    if preset_name == "auto" and advsettings.has_section(current, "cache"):
+        # Ručně vyladěný <cache> nepřepisovat odhadem podle RAM
+        xbmc.log("[Libretto] cache preset auto: keeping the existing <cache>", xbmc.LOGINFO)
+    elif preset_name:
+        ram = total_ram_mb()
+        preset_name, cache = advsettings.cache_preset(ram, preset_name)
+        xbmc.log(f"[Libretto] cache preset {preset_name} (RAM {ram} MB)", xbmc.LOGINFO)
 
-    xml = f"""<advancedsettings>
-  <videodatabase>
-    <type>mysql</type>
-    <host>{host}</host>
-    <port>{port}</port>
-    <user>{user}</user>
-    <pass>{pw}</pass>
-    <name>{vbase}</name>
-  </videodatabase>
-  <musicdatabase>
-    <type>mysql</type>
-    <host>{host}</host>
-    <port>{port}</port>
-    <user>{user}</user>
-    <pass>{pw}</pass>
-    <name>{mbase}</name>
-  </musicdatabase>
-  <videolibrary>
-    <importwatchedstate>{iw}</importwatchedstate>
-    <importresumepoint>{ir}</importresumepoint>
-  </videolibrary>
-</advancedsettings>
-""".rstrip() + "\n"
+    return advsettings.build_updates(
+        db={"video": advsettings.db_section(host, port, user, pw, vbase),
+            "music": advsettings.db_section(host, port, user, pw, mbase)},
+        videolibrary={"importwatchedstate": get_bool("import_watched", True),
+                      "importresumepoint": get_bool("import_resume", True)},
+        cache=cache,
+        timeouts=advsettings.NETWORK_TIMEOUTS if get_bool("network_timeouts", True) else None,
+    )
+
+def write_advancedsettings(confirm=True):
+    """
+    Merge the managed nodes into advancedsettings.xml, other content stays.
+    Returns (True, path), (False, error) or (None, reason) when the user declined.
+    """
+    if not get_str("db_host", "") or not get_str("db_user", ""):
+        return False, "Missing host/user"
 
     # zajisti existenci profilu
     prof_dir = profile_path()
@@ -85,15 +124,50 @@ def write_advancedsettings():
 
     target = profile_path("advancedsettings.xml")
     try:
-        f = xbmcvfs.File(target, 'w')
-        try:
-            f.write(xml)
-        finally:
-            f.close()
+        current = read_text(target)
+        merged = advsettings.merge(current, settings_updates(current))
+        if merged == current:
+            return True, target
+        if confirm and current:
+            # Před zápisem ukaž, co se změní (hesla skrytá)
+            xbmcgui.Dialog().textviewer(ls(30005, "Změny v advancedsettings.xml"),
+                                        advsettings.mask_passwords(advsettings.diff(current, merged)),
+                                        usemono=True)
+            if not xbmcgui.Dialog().yesno(ls(30000, "Libretto nastavení"),
+                                          ls(30006, "Zapsat tyto změny do advancedsettings.xml?")):
+                return None, "declined"
+            write_text(target + ".bak", current)
+        write_text(target, merged)
         return True, target
     except Exception as e:
         return False, str(e)
 
+def get_int(key, default=0):
+    try:
+        return int(get_str(key, str(default)))
+    except ValueError:
+        return default
+
+def run_probe(query=True):
+    """
+    Measure the DB server (dbprobe.run) and store the result in the settings.
+    Returns (result, warnings).
+    """
+    res = dbprobe.run(get_str("db_host", ""), get_str("db_port", "3306"),
+                      get_str("db_user", ""), get_str("db_pass", ""),
+                      get_str("videos_base", "MyVideos"),
+                      pings=get_int("probe_pings", dbprobe.DEFAULT_PINGS), query=query)
+    warn = dbprobe.warnings(res, rtt_ms=get_int("probe_warn_rtt", dbprobe.WARN_RTT_MS),
+                            query_ms=get_int("probe_warn_query", dbprobe.WARN_QUERY_MS))
+    for key in ("connect_ms", "rtt_ms", "query_ms"):
+        value = res.get(key)
+        ADDON.setSetting("probe_" + key, "" if value is None else f"{value:.1f}")
+    ADDON.setSetting("probe_result", dbprobe.summary(res) + (" (!)" if warn else ""))
+    ADDON.setSetting("probe_when", time.strftime("%Y-%m-%d %H:%M:%S"))
+    xbmc.log(f"[Libretto] DB probe: {dbprobe.summary(res)}" + (f"; warnings: {'; '.join(warn)}" if warn else ""),
+             xbmc.LOGWARNING if warn else xbmc.LOGINFO)
+    return res, warn
+
 def wizard():
     # První spuštění – nabídni otevření nastavení
     if not get_bool("first_run_done", False):
@@ -106,17 +180,92 @@ def wizard():
     host = get_str("db_host", "")
     user = get_str("db_user", "")
     if host and user and not get_bool("export_done", False):
+        # Před exportem ověř server; pomalý/nedostupný nechá uživatele rozhodnout
+        _, warn = run_probe(query=False)
+        if warn and not xbmcgui.Dialog().yesno(ls(30007, "Databáze odpovídá pomalu"),
+                                               "\n".join(warn) + "\n\n" + ls(30008, "Přesto exportovat?")):
+            return
         ok, msg = write_advancedsettings()
-        if ok:
+        if ok is None:
+            # Uživatel změny odmítl: nic nehlásit, zeptáme se při příštím startu
+            pass
+        elif ok:
             set_bool("export_done", True)
             xbmcgui.Dialog().notification("Libretto", ls(30003, "Nastavení uloženo."), xbmcgui.NOTIFICATION_INFO, 4000)
+            # Po exportu celé měření včetně dotazu na epizody (s ovladačem MySQL)
+            _, warn = run_probe(query=True)
+            if warn:
+                xbmcgui.Dialog().notification("Libretto", ls(30007, "Databáze odpovídá pomalu") + ": " + warn[0],
+                                              xbmcgui.NOTIFICATION_WARNING, 6000)
         else:
             xbmcgui.Dialog().notification("Libretto", ls(30004, "Chyba exportu") + ": " + str(msg),
                                           xbmcgui.NOTIFICATION_ERROR, 5000)
 
+# ----- zahřátí po startu -----
+EPISODE_PROPS = ["title", "season", "episode", "showtitle", "tvshowid", "playcount",
+                 "lastplayed", "dateadded", "resume", "art", "file"]
+
+# Dotazy jako u prvního vykreslení domovské obrazovky (widgety, Next-Up)
+WARMUP_QUERIES = [
+    ("recent episodes", "VideoLibrary.GetRecentlyAddedEpisodes",
+     {"properties": EPISODE_PROPS, "limits": {"start": 0, "end": 25}}),
+    ("in-progress episodes", "VideoLibrary.GetEpisodes",
+     {"properties": EPISODE_PROPS, "filter": {"field": "inprogress", "operator": "true", "value": ""},
+      "sort": {"method": "lastplayed", "order": "descending"}}),
+    ("tv shows", "VideoLibrary.GetTVShows",
+     {"properties": ["title", "art", "watchedepisodes", "episode", "lastplayed", "dateadded"]}),
+]
+WARMUP_PAUSE = 1.0   # s mezi dotazy
+
+def rpc(method, params=None):
+    body = {"jsonrpc": "2.0", "id": 1, "method": method}
+    if params is not None:
+        body["params"] = params
+    data = json.loads(xbmc.executeJSONRPC(json.dumps(body)))
+    if "error" in data:
+        raise RuntimeError(f"{method}: {data['error']}")
+    return data.get("result") or {}
+
+def warmup(monitor=None):
+    """
+    Run WARMUP_QUERIES once after startup (setting "warmup"), WARMUP_PAUSE apart.
+    Stops at playback or shutdown. Returns {label: seconds} of the queries that ran.
+    """
+    monitor = monitor or xbmc.Monitor()
+    player = xbmc.Player()
+    if monitor.waitForAbort(max(0, get_int("warmup_delay", 15))):
+        return {}
+    timings, stopped = {}, None
+    started = time.perf_counter()
+    for i, (label, method, params) in enumerate(WARMUP_QUERIES):
+        if i and monitor.waitForAbort(WARMUP_PAUSE):
+            stopped = "shutdown"
+            break
+        # Přehrávání má přednost, dotazy by jen zdržovaly
+        if player.isPlaying():
+            stopped = "playback"
+            break
+        t = time.perf_counter()
+        try:
+            rpc(method, params)
+        except Exception as e:
+            xbmc.log(f"[Libretto] warm-up {label} failed: {e}", xbmc.LOGWARNING)
+        timings[label] = time.perf_counter() - t
+    parts = ", ".join(f"{label} {sec * 1000.0:.0f} ms" for label, sec in timings.items())
+    xbmc.log(f"[Libretto] warm-up: {parts or 'nothing'}; queries {sum(timings.values()):.2f} s, "
+             f"total {time.perf_counter() - started:.2f} s" + (f" (stopped: {stopped})" if stopped else ""),
+             xbmc.LOGINFO)
+    return timings
+
 if __name__ == "__main__":
     # Service start → spusť wizard
     try:
         wizard()
     except Exception as e:
-        xbmcgui.Dialog().notification("Libretto", f"Chyba: {e}", xbmcgui.NOTIFICATION_ERROR, 6000)
\ No newline at end of file
+        xbmcgui.Dialog().notification("Libretto", f"Chyba: {e}", xbmcgui.NOTIFICATION_ERROR, 6000)
+    # Potom volitelné zahřátí DB a knihovny
+    if get_bool("warmup", False):
+        try:
+            warmup()
+        except Exception as e:
+            xbmc.log(f"[Libretto] warm-up failed: {e}", xbmc.LOGERROR)
\ No newline at end of file
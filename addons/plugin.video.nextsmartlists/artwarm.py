@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Warm Kodi's texture cache for the artwork of the first items of each profile.
+
+A freshly changed list otherwise stalls on its first scroll while Kodi
+downloads and decodes every thumb/fanart browse_profile hands to setArt.
+With the "warm_art" setting on, the service collects the art of the first
+"warm_items" episodes per profile, asks Textures.GetTextures which of them
+are cached already and requests the missing ones through the web server's
+/image/ endpoint, which caches an image before serving it.
+
+Requests are spread over the service loop (WARM_PER_STEP per step,
+WARM_INTERVAL apart) and paused while anything is playing.
+"""
+import time, base64, urllib.parse, urllib.request
+import xbmc  # type: ignore
+
+from library import setting, log, RpcBatch
+from listing import load_profiles, top_items
+
+DEFAULT_ITEMS = 10
+ART_KEYS = ("thumb", "fanart")
+WARM_PER_STEP = 2
+WARM_INTERVAL = 0.5
+FETCH_TIMEOUT = 30
+WEBSERVER_SETTINGS = ("services.webserver", "services.webserverport",
+                      "services.webserverusername", "services.webserverpassword")
+
+
+def enabled():
+    return setting("warm_art") == "true"
+
+
+def items_per_profile():
+    try:
+        return max(1, int(setting("warm_items") or DEFAULT_ITEMS))
+    except ValueError:
+        return DEFAULT_ITEMS
+
+
+def unwrap_image(url):
+    """Raw URL of an image:// URL, as the texture database stores it."""
+    if url.startswith("image://") and url.endswith("/"):
+        return urllib.parse.unquote(url[len("image://"):-1])
+    return url
+
+
+def art_urls(limit):
+    """Art URLs of the first `limit` items of every profile, in list order, without duplicates."""
+    urls = []
+    for cfg in load_profiles().values():
+        for ep in top_items(cfg, limit):
+            art = ep.get("art") or {}
+            urls.extend(art.get(k) for k in ART_KEYS if art.get(k))
+    return list(dict.fromkeys(urls))
+
+
+def missing_textures(urls):
+    """The URLs Textures.GetTextures does not know, checked in one batch."""
+    batch = RpcBatch()
+    calls = [(url, batch.add("Textures.GetTextures", {
+        "properties": ["url"],
+        "filter": {"field": "url", "operator": "is", "value": unwrap_image(url)},
+    }, lambda r: bool(r.get("textures")))) for url in urls]
+    batch.send()
+    missing = []
+    for url, call in calls:
+        try:
+            if call.result():
+                continue
+        except RuntimeError:
+            pass    # a failed lookup counts as missing; warming a cached image is harmless
+        missing.append(url)
+    return missing
+
+
+def webserver():
+    """(base URL, request headers) of Kodi's web server, or None when it is off."""
+    batch = RpcBatch()
+    calls = [batch.add("Settings.GetSettingValue", {"setting": s}, lambda r: r.get("value"))
+             for s in WEBSERVER_SETTINGS]
+    batch.send()
+    try:
+        on, port, user, password = [c.result() for c in calls]
+    except RuntimeError as e:
+        log(f"web server settings unavailable: {e}")
+        return None
+    if not on or not port:
+        return None
+    headers = {}
+    if password:
+        token = base64.b64encode(f"{user or ''}:{password}".encode("utf-8")).decode("ascii")
+        headers["Authorization"] = f"Basic {token}"
+    return f"http://127.0.0.1:{port}", headers
+
+
+def fetch(server, url):
+    base, headers = server
+    req = urllib.request.Request(f"{base}/image/{urllib.parse.quote(url, safe='')}", headers=headers)
+    with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+        while resp.read(65536):
+            pass
+
+
+class ArtWarmer(object):
+    """Queue of missing artwork, fetched a few images per service loop step."""
+
+    def __init__(self):
+        self.queue = []
+        self.server = None
+        self.next_fetch = 0.0
+        self.counts = None    # warmed/failed/cached of the current round
+        self.started = 0.0
+
+    def refresh(self):
+        """Collect the art of the current listings and queue what is not cached yet."""
+        urls = art_urls(items_per_profile())
+        missing = missing_textures(urls) if urls else []
+        self.queue = missing
+        self.counts = {"warmed": 0, "failed": 0, "cached": len(urls) - len(missing)}
+        self.started = time.time()
+        if not missing:
+            log(f"art warming: {self.counts['cached']} images already cached")
+            return
+        self.server = webserver()
+        if self.server is None:
+            log(f"art warming: {len(missing)} images not cached, "
+                f"{self.counts['cached']} cached; needs the web server (Settings > Services > Control)")
+            self.queue = []
+            return
+        log(f"art warming: {len(missing)} images to warm, {self.counts['cached']} already cached")
+
+    def pending(self):
+        return bool(self.queue)
+
+    def cancel(self):
+        self.queue = []
+
+    def step(self, monitor):
+        """Fetch up to WARM_PER_STEP queued images; nothing while a video or song plays."""
+        if not self.queue or xbmc.Player().isPlaying():
+            return
+        for _ in range(WARM_PER_STEP):
+            if not self.queue or monitor.abortRequested():
+                break
+            wait = self.next_fetch - time.time()
+            if wait > 0 and monitor.waitForAbort(wait):
+                break
+            url = self.queue.pop(0)
+            try:
+                fetch(self.server, url)
+                self.counts["warmed"] += 1
+            except Exception as e:
+                self.counts["failed"] += 1
+                log(f"art warming failed for {url}: {e}")
+            self.next_fetch = time.time() + WARM_INTERVAL
+        if not self.queue:
+            c = self.counts
+            log(f"art warming done: {c['warmed']} warmed, {c['failed']} failed, "
+                f"{c['cached']} already cached in {time.time() - self.started:.1f} s")
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Compact binary format for the per-show Next-Up state (index and snapshots).
+
+JSON with full episode dicts costs as much to parse as the query it saves,
+so shows are stored as fixed-width records instead and read in place
+(mmap); a browse decodes strings only for the episodes it keeps.
+
+Layout, little endian:
+
+    header    HEADER: magic, version, reserved, crc32 of everything after
+              the header, built, #shows, #episodes, #strings, string bytes,
+              string refs of the lastplayed/dateadded marks
+    shows     SHOW per show, sorted by tvshowid: tvshowid, flags,
+              record numbers of the inprogress/next/next_regular episode (-1 = none)
+    episodes  EPISODE per distinct candidate: ids, season/episode, playcount,
+              runtime, lastplayed/dateadded as epoch, resume position/total,
+              string refs of title/showtitle/file/thumb/fanart
+    offsets   #strings + 1 uint32 offsets into the string bytes (string 0 is "")
+    strings   UTF-8, deduplicated (show titles and fanart repeat)
+
+Timestamps are Kodi's "YYYY-MM-DD HH:MM:SS" strings; they are stored as
+if UTC so they format back to exactly the same text.
+"""
+import os, sys, mmap, time, zlib, struct, calendar
+from array import array
+
+MAGIC = b"NSNX"
+FORMAT_VERSION = 1
+CANDIDATES = ("inprogress", "next", "next_regular")
+FLAG_STARTED = 1
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+HEADER = struct.Struct("<4sHHIIIIIIII")
+SHOW = struct.Struct("<IIiii")
+EPISODE = struct.Struct("<IIiiIIIIddIIIII")
+SORT_KEYS = struct.Struct("<II")     # lastplayed, dateadded inside EPISODE
+SORT_KEYS_AT = 24
+
+
+class FormatError(ValueError):
+    """The data is not a readable index (truncated, other version, crc32 mismatch)."""
+
+
+def to_epoch(text):
+    if not text:
+        return 0
+    try:
+        return max(0, calendar.timegm(time.strptime(text, TIME_FORMAT)))
+    except (ValueError, OverflowError):
+        return 0
+
+
+def from_epoch(value):
+    return time.strftime(TIME_FORMAT, time.gmtime(value)) if value else ""
+
+
+def encode(shows, marks=None, built=None):
+    """Return the binary form of a shows dict ({tvshowid(str): entry}, see nextup)."""
+    strings, string_refs = [b""], {"": 0}
+
+    def ref(text):
+        text = text or ""
+        idx = string_refs.get(text)
+        if idx is None:
+            idx = string_refs[text] = len(strings)
+            strings.append(text.encode("utf-8"))
+        return idx
+
+    episodes, episode_refs = [], {}
+
+    def episode_ref(ep):
+        if not ep:
+            return -1
+        eid = int(ep.get("episodeid", 0))
+        idx = episode_refs.get(eid)
+        if idx is None:
+            art = ep.get("art") or {}
+            resume = ep.get("resume") or {}
+            idx = episode_refs[eid] = len(episodes)
+            episodes.append(EPISODE.pack(
+                eid, int(ep.get("tvshowid", 0)), int(ep.get("season", 0)), int(ep.get("episode", 0)),
+                int(ep.get("playcount", 0) or 0), int(ep.get("runtime", 0) or 0),
+                to_epoch(ep.get("lastplayed")), to_epoch(ep.get("dateadded")),
+                float(resume.get("position", 0) or 0), float(resume.get("total", 0) or 0),
+                ref(ep.get("title")), ref(ep.get("showtitle")), ref(ep.get("file")),
+                ref(art.get("thumb")), ref(art.get("fanart")),
+            ))
+        return idx
+
+    show_rows = []
+    for sid in sorted(shows, key=int):
+        entry = shows[sid]
+        show_rows.append(SHOW.pack(int(sid), FLAG_STARTED if entry.get("started") else 0,
+                                   *[episode_ref(entry.get(k)) for k in CANDIDATES]))
+    marks = marks or {}
+    mark_refs = (ref(marks.get("lastplayed")), ref(marks.get("dateadded")))
+
+    offsets = array("I", [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    string_data = b"".join(strings)
+    body = b"".join(show_rows) + b"".join(episodes) + offsets.tobytes() + string_data
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, zlib.crc32(body), int(built or time.time()),
+                         len(show_rows), len(episodes), len(strings), len(string_data), *mark_refs)
+    return header + body
+
+
+class IndexView(object):
+    """Read-only view on an encoded index (bytes or mmap); strings are decoded on demand.
+
+    Raises FormatError when the data is truncated, from another format
+    version or fails the crc32 check.
+    """
+
+    def __init__(self, data):
+        if len(data) < HEADER.size:
+            raise FormatError("truncated header")
+        (magic, version, _, crc, self.built, self.n_shows, self.n_episodes, n_strings,
+         string_bytes, lp_ref, da_ref) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise FormatError(f"unsupported format {magic!r} v{version}")
+        self.shows_at = HEADER.size
+        self.episodes_at = self.shows_at + SHOW.size * self.n_shows
+        offsets_at = self.episodes_at + EPISODE.size * self.n_episodes
+        self.strings_at = offsets_at + 4 * (n_strings + 1)
+        if len(data) != self.strings_at + string_bytes:
+            raise FormatError("size mismatch")
+        view = memoryview(data)
+        try:
+            # No copy of the body; the view is released so an mmap can still be closed
+            ok = zlib.crc32(view[HEADER.size:]) == crc
+        finally:
+            view.release()
+        if not ok:
+            raise FormatError("crc32 mismatch")
+        self.data = data
+        self.offsets = array("I")
+        self.offsets.frombytes(data[offsets_at:self.strings_at])
+        if sys.byteorder != "little":
+            self.offsets.byteswap()
+        self.marks = {"lastplayed": self.string(lp_ref), "dateadded": self.string(da_ref)}
+
+    def string(self, idx):
+        return self.data[self.strings_at + self.offsets[idx]:self.strings_at + self.offsets[idx + 1]].decode("utf-8")
+
+    def __len__(self):
+        return self.n_shows
+
+    def show_rows(self):
+        """Yield (tvshowid(str), started, inprogress_rec, next_rec, next_regular_rec)."""
+        for i in range(self.n_shows):
+            sid, flags, inprog, nxt, regular = SHOW.unpack_from(self.data, self.shows_at + SHOW.size * i)
+            yield str(sid), bool(flags & FLAG_STARTED), inprog, nxt, regular
+
+    def sort_keys(self, rec):
+        """(lastplayed, dateadded) epochs of an episode record, without decoding it."""
+        return SORT_KEYS.unpack_from(self.data, self.episodes_at + EPISODE.size * rec + SORT_KEYS_AT)
+
+    def episode(self, rec):
+        """Decode one episode record into the JSON-RPC episode dict."""
+        (eid, sid, season, number, playcount, runtime, lastplayed, dateadded, position, total,
+         title, showtitle, path, thumb, fanart) = EPISODE.unpack_from(self.data, self.episodes_at + EPISODE.size * rec)
+        title = self.string(title)
+        art = {}
+        if thumb:
+            art["thumb"] = self.string(thumb)
+        if fanart:
+            art["fanart"] = self.string(fanart)
+        return {
+            "episodeid": eid, "label": title, "title": title, "season": season, "episode": number,
+            "showtitle": self.string(showtitle), "tvshowid": sid, "playcount": playcount,
+            "file": self.string(path), "runtime": runtime, "art": art,
+            "dateadded": from_epoch(dateadded), "lastplayed": from_epoch(lastplayed),
+            "resume": {"position": position, "total": total},
+        }
+
+    def select(self, accept, inprogress_only=False, skip_specials=True):
+        """Return the candidate record per accepted show, as in nextup.select_episodes()."""
+        recs = []
+        for sid, _, inprog, nxt, regular in self.show_rows():
+            if not accept(sid):
+                continue
+            rec = inprog
+            if rec < 0 and not inprogress_only:
+                rec = regular if skip_specials else nxt
+            if rec >= 0:
+                recs.append(rec)
+        return recs
+
+    def to_shows(self):
+        """Decode everything back into the shows dict."""
+        cache = {}
+
+        def ep(rec):
+            if rec < 0:
+                return None
+            if rec not in cache:
+                cache[rec] = self.episode(rec)
+            return cache[rec]
+        return {sid: {"inprogress": ep(a), "next": ep(b), "next_regular": ep(c), "started": started}
+                for sid, started, a, b, c in self.show_rows()}
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def write(path, shows, marks=None, built=None):
+    """Encode and write atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode(shows, marks, built))
+    os.replace(tmp, path)
+
+
+def read(path):
+    """Return an IndexView of the file, or raise OSError/FormatError.
+
+    The file is memory-mapped, except on Windows where a mapping would keep
+    the service from replacing it; there it is read into memory.
+    """
+    with open(path, "rb") as f:
+        if os.name == "nt" or os.fstat(f.fileno()).st_size == 0:
+            return IndexView(f.read())
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return IndexView(data)
+    except Exception:
+        data.close()
+        raise
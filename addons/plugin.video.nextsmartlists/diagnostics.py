@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Timing diagnostics for slow widgets.
+
+When the "diagnostics" setting is on, plugin.run() calls start(); rpc() and
+the browse stages then record how long each step took into
+diagnostics.jsonl in the addon profile dir. When it is off, ACTIVE stays
+False and every hook is a single attribute check.
+
+Plugin calls (several may run at once) only ever append to the file; the
+service calls rotate() now and then, which renames a full file to
+diagnostics.1.jsonl. load_records() reads both, so the report covers the
+newest MAX_RECORDS to 2 * MAX_RECORDS records.
+
+Records:
+
+    {"t": epoch, "kind": "rpc"|"decode"|"stage"|"browse", "name": str,
+     "ms": float, "bytes": int, "items": int, "profile": str}
+"""
+import os, json, time
+import xbmc  # type: ignore
+
+STATS_FILE = "diagnostics.jsonl"
+OLD_STATS_FILE = "diagnostics.1.jsonl"
+MAX_RECORDS = 2000
+REPORT_SLOWEST = 10
+
+ACTIVE = False
+_state = {"path": None, "records": [], "profile": ""}
+
+
+def start(profile_path):
+    global ACTIVE
+    ACTIVE = True
+    _state.update(path=os.path.join(profile_path, STATS_FILE), records=[], profile="")
+
+
+def stop():
+    """Write the records of this call and switch recording off."""
+    global ACTIVE
+    if not ACTIVE:
+        return
+    ACTIVE = False
+    records, _state["records"] = _state["records"], []
+    if records and _state["path"]:
+        try:
+            _append(_state["path"], records)
+        except OSError as e:
+            xbmc.log(f"[NextSmart] writing {STATS_FILE} failed: {e}", xbmc.LOGWARNING)
+
+
+def set_profile(profile_key):
+    _state["profile"] = profile_key
+
+
+def record(kind, name, seconds, size=0, items=0):
+    if not ACTIVE:
+        return
+    _state["records"].append({
+        "t": int(time.time()), "kind": kind, "name": name, "ms": round(seconds * 1000.0, 2),
+        "bytes": int(size), "items": int(items), "profile": _state["profile"],
+    })
+
+
+class Stage(object):
+    """Context manager recording one browse stage: `with Stage("render") as st: st.items = n`."""
+
+    def __init__(self, name, kind="stage"):
+        self.name = name
+        self.kind = kind
+        self.items = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter() if ACTIVE else 0.0
+        return self
+
+    def __exit__(self, *exc):
+        if ACTIVE:
+            record(self.kind, self.name, time.perf_counter() - self.start, items=self.items)
+
+
+def result_items(result):
+    """Number of library rows in a JSON-RPC result (episodes, tvshows, ...)."""
+    if isinstance(result, dict):
+        for key in ("episodes", "tvshows", "movies", "textures"):
+            if isinstance(result.get(key), list):
+                return len(result[key])
+    return 0
+
+
+def _append(path, records):
+    # One write() in append mode: concurrent plugin calls add whole lines
+    # instead of replacing each other's file
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in records))
+
+
+def rotate(profile_path, max_records=MAX_RECORDS):
+    """
+    Move a full diagnostics.jsonl aside (service side, rarely). The rename is
+    atomic; a plugin call still holding the old file open finishes its line
+    in diagnostics.1.jsonl. Returns True if the file was rotated.
+    """
+    path = os.path.join(profile_path, STATS_FILE)
+    try:
+        with open(path, "rb") as f:
+            count = sum(1 for _ in f)
+    except FileNotFoundError:
+        return False
+    if count < max_records:
+        return False
+    os.replace(path, os.path.join(profile_path, OLD_STATS_FILE))
+    return True
+
+
+def load_records(profile_path):
+    out = []
+    for name in (OLD_STATS_FILE, STATS_FILE):
+        path = os.path.join(profile_path, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    out.append(json.loads(line))
+                except ValueError:
+                    continue
+    return out
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def _table(groups):
+    lines = []
+    for name in sorted(groups, key=lambda n: -percentile(groups[n], 95)):
+        ms = groups[name]
+        lines.append(f"{name:<40} n={len(ms):<5} p50={percentile(ms, 50):>8.1f} ms  p95={percentile(ms, 95):>8.1f} ms")
+    return lines or ["(no data)"]
+
+
+def report(records, profile_names=None):
+    """Return the text shown by the Diagnostics view."""
+    profile_names = profile_names or {}
+    methods, stages, browses = {}, {}, []
+    for r in records:
+        if r.get("kind") in ("rpc", "decode"):
+            methods.setdefault(f"{r['kind']}: {r['name']}", []).append(r["ms"])
+        elif r.get("kind") == "stage":
+            label = f"{profile_names.get(r.get('profile'), r.get('profile') or '-')}: {r['name']}"
+            stages.setdefault(label, []).append(r["ms"])
+        elif r.get("kind") == "browse":
+            browses.append(r)
+
+    lines = [f"Records: {len(records)}", "", "[B]Per JSON-RPC method[/B]"]
+    lines += _table(methods)
+    lines += ["", "[B]Per profile and stage[/B]"]
+    lines += _table(stages)
+    lines += ["", "[B]Slowest recent browses[/B]"]
+    browses.sort(key=lambda r: -r["ms"])
+    for r in browses[:REPORT_SLOWEST]:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["t"]))
+        name = profile_names.get(r["name"], r["name"])
+        lines.append(f"{when}  {name:<30} {r['ms']:>8.1f} ms  {r['items']} items")
+    if not browses:
+        lines.append("(no data)")
+    return "\n".join(lines)
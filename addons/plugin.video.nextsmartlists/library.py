@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+"""Library access shared by the plugin (main.py) and the background service."""
+import json, time
+from datetime import datetime, timedelta
+import xbmc  # type: ignore
+import xbmcaddon  # type: ignore
+import xbmcgui  # type: ignore
+import xbmcvfs  # type: ignore
+
+import diagnostics
+
+ADDON = xbmcaddon.Addon()
+
+
+def setting(key):
+    """Current value of one of our settings.
+
+    A fresh Addon object per read: with reuselanguageinvoker (and in the
+    service) the module-level ADDON can keep returning values from before
+    the user changed them. ADDON stays for getAddonInfo().
+    """
+    return xbmcaddon.Addon().getSetting(key)
+
+
+def log(msg):
+    try:
+        xbmc.log(f"[NextSmart] {msg}", xbmc.LOGINFO)
+    except Exception:
+        pass
+
+
+def profile_dir():
+    p = xbmcvfs.translatePath(ADDON.getAddonInfo('profile'))
+    if not xbmcvfs.exists(p):
+        xbmcvfs.mkdirs(p)
+    return p
+
+# ---------------- Cross-invocation memo ----------------
+# With reuselanguageinvoker this module stays imported between plugin calls.
+# Entries are dropped after their TTL or as soon as the service bumps the
+# generation property on the home window (library or index changed).
+
+GENERATION_PROP = "NextSmart.Generation"
+_memo = {}
+
+
+def library_generation():
+    return xbmcgui.Window(10000).getProperty(GENERATION_PROP)
+
+
+def bump_generation():
+    xbmcgui.Window(10000).setProperty(GENERATION_PROP, str(time.time()))
+
+
+def memoized(key, build, ttl):
+    """Return build(), reused in this interpreter for `ttl` seconds within one generation."""
+    gen = library_generation()
+    now = time.time()
+    hit = _memo.get(key)
+    if hit is not None and hit[0] == gen and now - hit[1] <= ttl:
+        return hit[2]
+    value = build()
+    _memo[key] = (gen, now, value)
+    return value
+
+
+def invalidate_memo():
+    _memo.clear()
+
+
+def _execute(body, name):
+    """executeJSONRPC + json.loads; timed separately when diagnostics are on."""
+    if not diagnostics.ACTIVE:
+        return json.loads(xbmc.executeJSONRPC(json.dumps(body)))
+    t0 = time.perf_counter()
+    resp = xbmc.executeJSONRPC(json.dumps(body))
+    t1 = time.perf_counter()
+    data = json.loads(resp)
+    t2 = time.perf_counter()
+    results = data if isinstance(data, list) else [data]
+    items = sum(diagnostics.result_items(d.get("result")) for d in results if isinstance(d, dict))
+    diagnostics.record("rpc", name, t1 - t0, len(resp), items)
+    diagnostics.record("decode", name, t2 - t1, len(resp), items)
+    return data
+
+
+def rpc(method, params=None):
+    body = {"jsonrpc": "2.0", "id": 1, "method": method}
+    if params is not None:
+        body["params"] = params
+    data = _execute(body, method)
+    if "error" in data:
+        raise RuntimeError(f"JSON-RPC error: {data['error']}")
+    return data.get("result", {})
+
+
+class RpcCall(object):
+    """One queued call of an RpcBatch; result() is available after the batch was sent."""
+
+    def __init__(self, call_id, method, params=None, parse=None):
+        self.id = call_id
+        self.method = method
+        self.params = params
+        self.parse = parse
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def request(self):
+        body = {"jsonrpc": "2.0", "id": self.id, "method": self.method}
+        if self.params is not None:
+            body["params"] = self.params
+        return body
+
+    def resolve(self, response):
+        self.done = True
+        if response is None:
+            self.error = "no response in batch"
+        elif "error" in response:
+            self.error = response["error"]
+        else:
+            result = response.get("result", {})
+            try:
+                self.value = self.parse(result) if self.parse else result
+            except Exception as e:
+                self.error = f"{self.method}: {e}"
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError(f"{self.method}: batch not sent")
+        if self.error is not None:
+            raise RuntimeError(f"JSON-RPC error: {self.error}")
+        return self.value
+
+
+class RpcBatch(object):
+    """Queue several JSON-RPC calls and send them as one JSON-RPC 2.0 array request.
+
+    Responses are routed back by id; a failing call only marks its own
+    RpcCall as failed, the rest of the batch is still usable.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def add(self, method, params=None, parse=None):
+        call = RpcCall(len(self.calls) + 1, method, params, parse)
+        self.calls.append(call)
+        return call
+
+    def send(self):
+        pending = [c for c in self.calls if not c.done]
+        if not pending:
+            return self.calls
+        methods = sorted({c.method for c in pending})
+        data = _execute([c.request() for c in pending], f"Batch[{len(pending)}]: {', '.join(methods)}")
+        if isinstance(data, dict):
+            # Whole request rejected (e.g. parse error): fail every call with that error
+            for c in pending:
+                c.resolve(data if "error" in data else None)
+            return self.calls
+        by_id = {d.get("id"): d for d in data if isinstance(d, dict)}
+        for c in pending:
+            c.resolve(by_id.get(c.id))
+        return self.calls
+
+
+def rpc_single(queue, *args):
+    """Run one queue_* helper as a batch of one and return its parsed result."""
+    batch = RpcBatch()
+    call = queue(batch, *args)
+    batch.send()
+    return call.result()
+
+# ---------------- Library helpers ----------------
+
+EPISODE_PROPS = [
+    "title","season","episode","showtitle","tvshowid",
+    "playcount","file","runtime","art","dateadded","lastplayed","resume"
+]
+RECENT_FIRST = {"method": "lastplayed", "order": "descending"}
+
+
+INPROGRESS_FILTER = {"field": "inprogress", "operator": "true", "value": ""}
+
+
+def first_per_show(episodes):
+    """Return {tvshowid(str): episode} keeping the first episode seen for each show."""
+    mapping = {}
+    for ep in episodes:
+        tvsid = str(ep.get("tvshowid"))
+        if tvsid not in mapping:
+            mapping[tvsid] = ep
+    return mapping
+
+
+FETCH_CHUNK = 2000
+# Rows each page after the first re-reads from the previous one
+PAGE_OVERLAP = 50
+
+
+def episode_chunk_params(params, start, chunk=FETCH_CHUNK):
+    return dict(params, limits={"start": start, "end": start + chunk})
+
+
+def iter_episodes(params, chunk=FETCH_CHUNK):
+    """Yield the episodes of one GetEpisodes query, fetched `chunk` rows at a time.
+
+    Pages with limits.start/end and drops each page before requesting the
+    next, so only one chunk is in memory however large the result is.
+    Stopping the iteration early skips the remaining pages.
+
+    JSON-RPC has no keyset paging, only offsets: an episode that leaves the
+    result between two pages (e.g. marked watched on another client) moves
+    every later row one offset back. Each page after the first therefore
+    starts up to PAGE_OVERLAP rows early and skips the episodes the previous
+    page already yielded. A bigger shift can still drop rows from this pass;
+    the service's periodic full rebuild recomputes those shows.
+    """
+    start = 0
+    seen = set()
+    overlap = min(PAGE_OVERLAP, chunk // 5)
+    while True:
+        offset = max(0, start - overlap)
+        r = rpc("VideoLibrary.GetEpisodes", episode_chunk_params(params, offset, start + chunk - offset))
+        eps = r.get("episodes", []) or []
+        total = int((r.get("limits") or {}).get("total", 0))
+        r = None
+        count = len(eps)
+        if overlap and seen and count and not any(ep.get("episodeid") in seen for ep in eps[:overlap]):
+            log(f"episode paging: result shifted by more than {overlap} rows at offset {start}")
+        page_ids = set()
+        for ep in eps:
+            eid = ep.get("episodeid")
+            page_ids.add(eid)
+            if eid not in seen:
+                yield ep
+        eps, seen = None, page_ids
+        start += chunk
+        if not count or start >= total:
+            return
+
+
+def queue_inprogress_by_show(batch):
+    """Queue the in-progress query; the call resolves to {tvshowid(str): episode_dict}."""
+    def parse(r):
+        # Kodi sorts by lastplayed desc, so the first episode seen per show is the most recent
+        mapping = first_per_show(r.get("episodes", []) or [])
+        log(f"inprogress shows: {len(mapping)}")
+        return mapping
+    return batch.add("VideoLibrary.GetEpisodes", {
+        "properties": EPISODE_PROPS,
+        "filter": INPROGRESS_FILTER,
+        "sort": RECENT_FIRST,
+    }, parse)
+
+
+def get_recent_inprogress(max_shows, accept=None, page_size=50):
+    """Like queue_inprogress_by_show(), but stop once `max_shows` accepted shows are found.
+
+    Pages through the lastplayed-desc in-progress list with limits.start/end,
+    so a short widget never pulls the whole in-progress set.
+    """
+    mapping = {}
+    params = {"properties": EPISODE_PROPS, "filter": INPROGRESS_FILTER, "sort": RECENT_FIRST}
+    for ep in iter_episodes(params, page_size):
+        sid = str(ep.get("tvshowid"))
+        if sid not in mapping and (accept is None or accept(sid)):
+            mapping[sid] = ep
+            if len(mapping) >= max_shows:
+                break
+    log(f"inprogress shows (top {max_shows}): {len(mapping)}")
+    return mapping
+
+
+WATCHED_SHOWS_FILTER = {"field": "numwatched", "operator": "greaterthan", "value": "0"}
+
+
+def queue_show_progress(batch):
+    """Queue the watched-shows query; the call resolves to (started, finished) sets of tvshowids (str).
+
+    Uses the show-level watchedepisodes/episode aggregates, one row per show,
+    instead of listing every watched episode. "finished" shows have no
+    unplayed episode left, so they need no Next-Up lookup.
+    """
+    def parse(r):
+        started, finished = set(), set()
+        for show in r.get("tvshows", []) or []:
+            watched = int(show.get("watchedepisodes", 0) or 0)
+            if watched <= 0:
+                continue
+            total = int(show.get("episode", 0) or 0)
+            (finished if watched >= total else started).add(str(show.get("tvshowid")))
+        log(f"watched shows: {len(started)} started, {len(finished)} finished")
+        return started, finished
+    return batch.add("VideoLibrary.GetTVShows", {
+        "properties": ["watchedepisodes", "episode", "lastplayed"],
+        "filter": WATCHED_SHOWS_FILTER,
+    }, parse)
+
+
+def queue_all_tvshows(batch):
+    """Queue the TV show list; the call resolves to [{"tvshowid": id, "title": str}] sorted by title."""
+    def parse(r):
+        shows = r.get("tvshows", []) or []
+        shows.sort(key=lambda s: (s.get("title") or "").lower())
+        return [{"tvshowid": int(s.get("tvshowid")), "title": s.get("title","")} for s in shows]
+    return batch.add("VideoLibrary.GetTVShows", {
+        "properties": ["title"],
+        # no server-side sort; we'll sort here
+    }, parse)
+
+
+def get_all_tvshows():
+    """Return list of dicts: [{"tvshowid": id, "title": str}] sorted by title."""
+    return rpc_single(queue_all_tvshows)
+
+
+def get_show_marker():
+    """Return "<show count>|<newest dateadded>", which changes when shows are added or removed."""
+    r = rpc("VideoLibrary.GetTVShows", {
+        "properties": ["dateadded"],
+        "sort": {"method": "dateadded", "order": "descending"},
+        "limits": {"start": 0, "end": 1},
+    })
+    shows = r.get("tvshows", []) or []
+    total = int((r.get("limits") or {}).get("total", len(shows)))
+    return f"{total}|{shows[0].get('dateadded', '') if shows else ''}"
+
+
+def get_first_unplayed_episode(tvshow_id, skip_specials=True, after=None):
+    """Return first unplayed episode for tvshow_id or None.
+
+    `after` = (season, episode) only considers episodes following that one.
+    """
+    filt = {"and": [
+        {"field": "playcount", "operator": "is", "value": "0"}
+    ]}
+    r = rpc("VideoLibrary.GetEpisodes", {
+        "tvshowid": int(tvshow_id),
+        "properties": [
+            "title","season","episode","showtitle","tvshowid",
+            "file","runtime","art","dateadded","lastplayed","resume"
+        ],
+        "filter": filt
+    })
+    eps = r.get("episodes", []) or []
+    if skip_specials:
+        eps = [e for e in eps if int(e.get("season", 0)) > 0]
+    if after is not None:
+        eps = [e for e in eps if (int(e.get("season", 0)), int(e.get("episode", 0))) > tuple(after)]
+    # Sort by (season, episode)
+    eps.sort(key=lambda e: (int(e.get("season", 0)), int(e.get("episode", 0))))
+    return eps[0] if eps else None
+
+
+def pick_first_unplayed_variants(episodes, tvshow_ids=None, variants=None):
+    """pick_first_unplayed() for several skip_specials variants in one pass over `episodes`.
+
+    `variants` maps a result key to its skip_specials flag; returns
+    {key: {tvshowid(str): episode_dict}}. `episodes` may be a generator, only
+    the current best episode per show and variant is kept.
+    """
+    variants = variants or {"next_regular": True}
+    wanted = None if tvshow_ids is None else {str(sid) for sid in tvshow_ids}
+    best = {key: {} for key in variants}
+    for ep in episodes:
+        sid = str(ep.get("tvshowid"))
+        if wanted is not None and sid not in wanted:
+            continue
+        if int(ep.get("playcount", 0) or 0) > 0:
+            continue
+        key = (int(ep.get("season", 0)), int(ep.get("episode", 0)))
+        for name, skip_specials in variants.items():
+            if skip_specials and key[0] <= 0:
+                continue
+            cur = best[name].get(sid)
+            if cur is None or key < (int(cur.get("season", 0)), int(cur.get("episode", 0))):
+                best[name][sid] = ep
+    return best
+
+
+def pick_first_unplayed(episodes, tvshow_ids=None, skip_specials=True):
+    """Return {tvshowid(str): episode_dict} with the lowest unplayed (season, episode) per show.
+
+    `episodes` may contain watched episodes and other shows; tvshow_ids=None keeps all shows.
+    """
+    return pick_first_unplayed_variants(episodes, tvshow_ids, {"next": skip_specials})["next"]
+
+
+UNPLAYED_FILTER = {"field": "playcount", "operator": "is", "value": "0"}
+SEASON_ORDER = {"method": "episode"}
+# Shows per JSON-RPC batch request in get_next_unplayed()
+SHOW_BATCH = 200
+
+
+def queue_first_regular_unplayed(batch, tvshow_id):
+    """Queue the first unplayed season > 0 episode of one show; resolves to an episode dict or None.
+
+    Kodi sorts by season/episode and returns a single row, so only that
+    episode (and its art) is read.
+    """
+    return batch.add("VideoLibrary.GetEpisodes", {
+        "tvshowid": int(tvshow_id),
+        "properties": EPISODE_PROPS,
+        "filter": {"and": [UNPLAYED_FILTER, {"field": "season", "operator": "greaterthan", "value": "0"}]},
+        "sort": SEASON_ORDER,
+        "limits": {"start": 0, "end": 1},
+    }, lambda r: (r.get("episodes") or [None])[0])
+
+
+def queue_first_unplayed_special(batch, tvshow_id):
+    """Queue the unplayed specials of one show; resolves to the lowest numbered one or None.
+
+    Not sorted in Kodi: its episode order places specials by their airing
+    position, Next-Up orders them by (season, episode) like pick_first_unplayed().
+    """
+    def parse(r):
+        eps = r.get("episodes") or []
+        return min(eps, key=lambda e: int(e.get("episode", 0))) if eps else None
+    return batch.add("VideoLibrary.GetEpisodes", {
+        "tvshowid": int(tvshow_id),
+        "properties": EPISODE_PROPS,
+        "filter": {"and": [UNPLAYED_FILTER, {"field": "season", "operator": "is", "value": "0"}]},
+    }, parse)
+
+
+def get_next_unplayed(tvshow_ids, variants):
+    """pick_first_unplayed() for the given shows, asked per show instead of over the whole library.
+
+    `variants` maps a result key to its skip_specials flag; returns
+    {key: {tvshowid(str): episode_dict}}. Every show costs one single-row
+    query, plus one for its specials when a variant keeps them; SHOW_BATCH
+    shows go in one batch request.
+    """
+    with_specials = not all(variants.values())
+    ids = [str(sid) for sid in tvshow_ids]
+    best = {key: {} for key in variants}
+    for start in range(0, len(ids), SHOW_BATCH):
+        batch = RpcBatch()
+        calls = [(sid, queue_first_regular_unplayed(batch, sid),
+                  queue_first_unplayed_special(batch, sid) if with_specials else None)
+                 for sid in ids[start:start + SHOW_BATCH]]
+        batch.send()
+        for sid, regular_call, special_call in calls:
+            regular = regular_call.result()
+            # Season 0 sorts first, so an unplayed special comes before any regular episode
+            special = special_call.result() if special_call else None
+            for key, skip_specials in variants.items():
+                ep = regular if skip_specials else (special or regular)
+                if ep is not None:
+                    best[key][sid] = ep
+    log(f"next-up resolved: {len(set().union(*best.values()))}/{len(ids)} shows")
+    return best
+
+
+def get_show_episodes(tvshow_id):
+    """Return all episodes of one show with the properties used for Next-Up."""
+    r = rpc("VideoLibrary.GetEpisodes", {
+        "tvshowid": int(tvshow_id),
+        "properties": EPISODE_PROPS,
+    })
+    return r.get("episodes", []) or []
+
+
+MARK_FIELDS = ("lastplayed", "dateadded")
+# Stands in for an empty mark: episodes never played have no lastplayed and never match
+MARK_FLOOR = "1970-01-01 00:00:00"
+
+
+def queue_latest(batch, field):
+    """Queue a one-row query; the call resolves to the newest `field` value in the library ("" if none)."""
+    def parse(r):
+        eps = r.get("episodes", []) or []
+        return (eps[0].get(field) or "") if eps else ""
+    return batch.add("VideoLibrary.GetEpisodes", {
+        "properties": [field],
+        "sort": {"method": field, "order": "descending"},
+        "limits": {"start": 0, "end": 1},
+    }, parse)
+
+
+def get_watermarks():
+    """Return {"lastplayed": str, "dateadded": str}, the newest values in the library."""
+    batch = RpcBatch()
+    calls = {field: queue_latest(batch, field) for field in MARK_FIELDS}
+    batch.send()
+    return {field: call.result() for field, call in calls.items()}
+
+
+def second_before(stamp):
+    """Kodi "YYYY-MM-DD HH:MM:SS" timestamp one second earlier (unparsable values unchanged)."""
+    try:
+        return (datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return stamp
+
+
+def get_changed_since(marks):
+    """Return (tvshowids (str), new marks) for episodes played or added since `marks`.
+
+    "after" is strict and the timestamps have one second resolution, so the
+    filter starts one second before each mark: a change in the same second
+    as the mark is not lost. An idle library answers with just the rows at
+    the marks.
+    """
+    clauses = [{"field": field, "operator": "after", "value": second_before(marks.get(field) or MARK_FLOOR)}
+               for field in MARK_FIELDS]
+    r = rpc("VideoLibrary.GetEpisodes", {
+        "properties": ["tvshowid"] + list(MARK_FIELDS),
+        "filter": {"or": clauses},
+    })
+    ids = set()
+    new_marks = dict(marks)
+    for ep in r.get("episodes", []) or []:
+        ids.add(str(ep.get("tvshowid")))
+        for field in MARK_FIELDS:
+            if (ep.get(field) or "") > (new_marks.get(field) or ""):
+                new_marks[field] = ep[field]
+    return ids, new_marks
+
+
+def get_episode_show_id(episode_id):
+    """Return tvshowid (str) of an episode, or None if it is not in the library."""
+    try:
+        r = rpc("VideoLibrary.GetEpisodeDetails", {
+            "episodeid": int(episode_id),
+            "properties": ["tvshowid"]
+        })
+    except RuntimeError:
+        return None
+    sid = (r.get("episodedetails") or {}).get("tvshowid")
+    return str(sid) if sid is not None else None
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Last rendered listing per profile, used to serve widgets stale-while-revalidate.
+
+Each profile gets listings/<profile>.json in the addon profile dir:
+
+    {"saved": <epoch>, "config": <hash of the profile cfg>, "episodes": [...]}
+
+A listing saved for a different profile configuration is treated as a miss.
+"""
+import os, json, time, hashlib, shutil, tempfile
+
+from library import log, profile_dir
+
+CACHE_DIR = "listings"
+
+
+def _cache_dir():
+    return os.path.join(profile_dir(), CACHE_DIR)
+
+
+def _config_hash(cfg):
+    return hashlib.md5(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_listing(profile_key, cfg):
+    """Return (episodes, age_seconds) of the cached listing, or None."""
+    fp = os.path.join(_cache_dir(), f"{profile_key}.json")
+    if not os.path.exists(fp):
+        return None
+    try:
+        with open(fp, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        log(f"listing cache parse error ({profile_key}): {e}")
+        return None
+    if data.get("config") != _config_hash(cfg):
+        return None
+    return data.get("episodes") or [], max(0, int(time.time() - data.get("saved", 0)))
+
+
+def save_listing(profile_key, cfg, episodes):
+    """Write the listing atomically; raises OSError.
+
+    Several invocations of one profile (widgets, background refreshes) may
+    save at once, so every writer uses its own temp file; the last replace wins.
+    """
+    cdir = _cache_dir()
+    os.makedirs(cdir, exist_ok=True)
+    fp = os.path.join(cdir, f"{profile_key}.json")
+    fd, tmp = tempfile.mkstemp(prefix=f"{profile_key}.", suffix=".tmp", dir=cdir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"saved": int(time.time()), "config": _config_hash(cfg), "episodes": episodes}, f)
+        os.replace(tmp, fp)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def clear_listings():
+    shutil.rmtree(_cache_dir(), ignore_errors=True)
+
+
+def listed_episodes():
+    """Return {episodeid: profile_key} of every cached listing."""
+    cdir = _cache_dir()
+    listed = {}
+    if not os.path.isdir(cdir):
+        return listed
+    for name in os.listdir(cdir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(cdir, name), "r", encoding="utf-8") as f:
+                episodes = json.load(f).get("episodes") or []
+        except Exception as e:
+            log(f"listing cache parse error ({name}): {e}")
+            continue
+        for ep in episodes:
+            listed.setdefault(int(ep.get("episodeid", 0)), name[:-len(".json")])
+    return listed
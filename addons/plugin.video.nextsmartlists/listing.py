@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Profiles and the episode listing computed for them.
+
+Shared by the plugin (browse_profile) and the service, which publishes the
+listings as home-window properties (widgetprops.py).
+"""
+import os, json, copy, heapq
+
+from library import log, profile_dir, memoized
+import nextup
+import snapshot
+import planner
+import diagnostics
+
+PROFILES_FILE = "profiles.json"
+
+# Parsed profiles.json keyed by file mtime/size; survives between calls under
+# reuselanguageinvoker. Callers get a copy, they are free to modify it.
+_profiles_cache = {"key": None, "data": {}}
+
+
+def profiles_path():
+    return os.path.join(profile_dir(), PROFILES_FILE)
+
+
+def load_profiles():
+    try:
+        fp = profiles_path()
+        if not os.path.exists(fp):
+            return {}
+        st = os.stat(fp)
+        key = (st.st_mtime_ns, st.st_size)
+        if _profiles_cache["key"] != key:
+            with open(fp, "r", encoding="utf-8") as f:
+                data = f.read()
+            _profiles_cache["data"] = json.loads(data) if data.strip() else {}
+            _profiles_cache["key"] = key
+        return copy.deepcopy(_profiles_cache["data"])
+    except Exception as e:
+        log(f"profiles.json parse error: {e}")
+        return {}
+
+
+def forget_profiles():
+    """Drop the parsed profiles after profiles.json was written."""
+    _profiles_cache["key"] = None
+
+
+def episode_label(ep):
+    s = int(ep.get("season", 0)); e = int(ep.get("episode", 0))
+    return f"{ep.get('showtitle','')} - S{s:02d}E{e:02d} • {ep.get('title','')}"
+
+
+def resume_percent(ep):
+    """Watched percentage of a partially played episode, 0 otherwise."""
+    resume = ep.get("resume") or {}
+    try:
+        pos = float(resume.get("position", 0) or 0)
+        tot = float(resume.get("total", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+    return int(pos / tot * 100) if tot > 0 and pos > 0 else 0
+
+
+def compute_listing(cfg):
+    """Return the profile's episodes in display order."""
+    with diagnostics.Stage("compute") as st:
+        eps = _compute_listing(cfg)
+        st.items = len(eps)
+    return eps
+
+
+def top_items(cfg, limit):
+    """The first `limit` episodes of a profile (fewer if its max_items is lower)."""
+    max_items = int(cfg.get("max_items", 0) or 0)
+    # Only these items are needed: heap selection instead of a full sort
+    return compute_listing(dict(cfg, max_items=min(max_items, limit) if max_items else limit))
+
+
+def order_listing(items, cfg, key):
+    """Sort newest first and apply max_items."""
+    max_items = int(cfg.get("max_items", 0) or 0)
+    if max_items:
+        return heapq.nlargest(max_items, items, key=key)
+    return sorted(items, key=key, reverse=True)
+
+
+def _compute_listing(cfg):
+    recent = cfg.get("order_by_recent", True)
+    # Normal case: the service keeps the Next-Up index current, no library queries here.
+    index = nextup.load_index_cached()
+    if index is None:
+        plan = planner.plan_queries(cfg)
+        log("next-up index missing, querying library")
+        if not plan["key"]:
+            eps = nextup.select_episodes(nextup.build_shows(plan), cfg)
+            if recent:
+                key = lambda ep: (ep.get("lastplayed",""), ep.get("dateadded",""))
+            else:
+                key = lambda ep: (ep.get("dateadded",""), ep.get("lastplayed",""))
+            return order_listing(eps, cfg, key)
+        # Widgets refreshing together share one library query through the snapshot
+        index = memoized(("shows", plan["key"]),
+                         lambda: snapshot.shared(plan["key"], lambda: nextup.build_shows(plan)),
+                         snapshot.SNAPSHOT_TTL)
+
+    # Sort on the fixed-width records, decode only the episodes that are kept
+    if recent:
+        key = index.sort_keys
+    else:
+        key = lambda rec: index.sort_keys(rec)[::-1]
+    return [index.episode(rec) for rec in order_listing(nextup.select_records(index, cfg), cfg, key)]
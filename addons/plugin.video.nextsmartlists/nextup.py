@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""Per-show Next-Up index.
+
+The index lives next to profiles.json in the binary format of binindex.py.
+It is kept up to date by the background service (service.py) and read by
+browse_profile, so a normal browse needs no library queries at all. In
+memory (load_index/save_index) it is a dict:
+
+    {"version": 1, "built": <epoch>, "shows": {tvshowid(str): entry},
+     "marks": {"lastplayed": str, "dateadded": str}}
+
+"marks" are the newest lastplayed/dateadded values the index has seen.
+delta_sync() asks the library only for episodes past them, which picks up
+changes other clients of a shared (MySQL) library made without local
+notifications.
+
+Each entry holds the candidates for every profile variant:
+
+    {"inprogress": ep|None, "next": ep|None, "next_regular": ep|None, "started": bool}
+
+"next" is the first unplayed episode including specials, "next_regular" the
+first one with season > 0.
+"""
+import os, time
+
+from library import (
+    log, profile_dir, RpcBatch, queue_inprogress_by_show, queue_show_progress,
+    get_recent_inprogress, get_next_unplayed, pick_first_unplayed, get_show_episodes,
+    get_watermarks, get_changed_since,
+)
+import binindex
+import planner
+import sqlnextup
+
+INDEX_FILE = "nextup_index.bin"
+LEGACY_INDEX_FILE = "nextup_index.json"
+INDEX_VERSION = binindex.FORMAT_VERSION
+
+
+def index_path():
+    return os.path.join(profile_dir(), INDEX_FILE)
+
+
+def read_index_view():
+    """Return a binindex.IndexView of the persisted index, or None when missing/unreadable."""
+    fp = index_path()
+    if not os.path.exists(fp):
+        return None
+    try:
+        return binindex.read(fp)
+    except (OSError, binindex.FormatError) as e:
+        log(f"{INDEX_FILE} unreadable: {e}")
+        return None
+
+
+def load_index():
+    """Return the persisted index dict, or None when missing/unreadable."""
+    view = read_index_view()
+    if view is None:
+        return None
+    try:
+        return {"version": INDEX_VERSION, "built": view.built, "shows": view.to_shows(), "marks": view.marks}
+    finally:
+        view.close()
+
+
+_index_cache = {"key": None, "index": None}
+
+
+def load_index_cached():
+    """Index view for the plugin: reuses the mapped index while the file is unchanged.
+
+    Returns a binindex.IndexView (read-only) or None.
+    """
+    try:
+        st = os.stat(index_path())
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    if _index_cache["key"] != key:
+        _index_cache["index"] = read_index_view()
+        _index_cache["key"] = key
+    return _index_cache["index"]
+
+
+def save_index(index):
+    """Write the index atomically so a concurrent browse never sees a partial file."""
+    binindex.write(index_path(), index["shows"], index.get("marks"), index.get("built"))
+    legacy = os.path.join(profile_dir(), LEGACY_INDEX_FILE)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+
+def new_index(shows, marks=None):
+    return {"version": INDEX_VERSION, "built": int(time.time()), "shows": shows, "marks": marks or {}}
+
+
+def show_entry(episodes):
+    """Build an index entry from all episodes of one show, or None if the show is not started or fully watched."""
+    inprogress = None
+    started = False
+    for ep in episodes:
+        if int(ep.get("playcount", 0) or 0) > 0:
+            started = True
+        resume = ep.get("resume") or {}
+        if float(resume.get("position", 0) or 0) > 0:
+            if inprogress is None or ep.get("lastplayed", "") > inprogress.get("lastplayed", ""):
+                inprogress = ep
+    if not started and inprogress is None:
+        return None
+    sid = str((episodes[0] if episodes else {}).get("tvshowid"))
+    entry = {
+        "inprogress": inprogress,
+        "next": pick_first_unplayed(episodes, None, False).get(sid),
+        "next_regular": pick_first_unplayed(episodes, None, True).get(sid),
+        "started": started,
+    }
+    if inprogress is None and entry["next"] is None:
+        # Fully watched: nothing to offer, same as build_shows() dropping finished shows
+        return None
+    return entry
+
+
+def build_shows(plan=None):
+    """Compute entries for started/in-progress shows straight from the library.
+
+    `plan` comes from planner.plan_queries(); the default resolves everything
+    the index needs. In-progress-only plans skip the heavier queries.
+    """
+    if sqlnextup.enabled():
+        # One query resolves every variant; None means fall back to JSON-RPC
+        shows = sqlnextup.build_shows()
+        if shows is not None:
+            return shows
+    plan = plan or planner.FULL_PLAN
+    skip_specials = plan["skip_specials"]
+    if plan["inprogress_limit"]:
+        inprog_map = get_recent_inprogress(
+            plan["inprogress_limit"], planner.show_filter(plan), plan["page_size"])
+        return {sid: {"inprogress": ep, "next": None, "next_regular": None, "started": False}
+                for sid, ep in inprog_map.items()}
+
+    # One JSON-RPC batch for the show-level queries
+    batch = RpcBatch()
+    inprog_call = queue_inprogress_by_show(batch)
+    progress_call = queue_show_progress(batch) if plan["nextup"] else None
+    batch.send()
+    inprog_map = inprog_call.result()
+    started_ids, finished_ids = progress_call.result() if progress_call else (set(), set())
+    shows = {}
+    # Finished shows only stay when an episode is being rewatched
+    for sid in set(inprog_map.keys()) | started_ids:
+        shows[sid] = {
+            "inprogress": inprog_map.get(sid),
+            "next": None,
+            "next_regular": None,
+            "started": sid in started_ids or sid in finished_ids,
+        }
+    if plan["nextup"]:
+        pending = [sid for sid in started_ids if sid not in inprog_map]
+        if pending:
+            variants = {"next": False, "next_regular": True}
+            if skip_specials is not None:
+                variants = {"next_regular": True} if skip_specials else {"next": False}
+            # Only started shows, one row each: never-started shows and their episodes are not read
+            for key, best in get_next_unplayed(pending, variants).items():
+                for sid, ep in best.items():
+                    shows[sid][key] = ep
+    return shows
+
+
+def rebuild_index():
+    # Marks first: anything changing during the build is picked up again by the next delta_sync()
+    marks = get_watermarks()
+    index = new_index(build_shows(), marks)
+    save_index(index)
+    log(f"next-up index rebuilt: {len(index['shows'])} shows")
+    return index
+
+
+def refresh_show(index, tvshow_id):
+    """Recompute one show in place. Returns True when the entry changed."""
+    sid = str(tvshow_id)
+    return _set_entry(index, sid, show_entry(get_show_episodes(sid)))
+
+
+def advance_show(index, tvshow_id, episode_id):
+    """Recompute one show as if episode_id were already watched. Returns True when the entry changed.
+
+    Kodi marks an episode watched only when playback stops; this lets the
+    index move on as soon as playback passes the watched threshold.
+    """
+    sid = str(tvshow_id)
+    episodes = [dict(ep, playcount=max(1, int(ep.get("playcount", 0) or 0)),
+                     resume={"position": 0.0, "total": 0.0})
+                if int(ep.get("episodeid", 0)) == int(episode_id) else ep
+                for ep in get_show_episodes(sid)]
+    return _set_entry(index, sid, show_entry(episodes))
+
+
+def _set_entry(index, sid, entry):
+    shows = index["shows"]
+    if entry == shows.get(sid):
+        return False
+    if entry is None:
+        shows.pop(sid, None)
+    else:
+        shows[sid] = entry
+    return True
+
+
+def delta_sync(index):
+    """Return tvshowids changed since the index marks and advance the marks in place.
+
+    Returns None when the index has no marks yet (written by an older
+    version); the caller rebuilds it then. Removed episodes and changes with
+    timestamps behind the marks (clock skew between clients) are not seen
+    here, the periodic full rebuild in the service covers them.
+    """
+    marks = index.get("marks")
+    if not marks:
+        return None
+    ids, index["marks"] = get_changed_since(marks)
+    return ids
+
+
+def find_show_by_episode(index, episode_id):
+    """Return tvshowid (str) whose indexed candidates reference episode_id, or None."""
+    for sid, entry in index["shows"].items():
+        for key in ("inprogress", "next", "next_regular"):
+            ep = entry.get(key)
+            if ep and int(ep.get("episodeid", 0)) == int(episode_id):
+                return sid
+    return None
+
+
+def select_records(view, cfg):
+    """select_episodes() on a binindex.IndexView; returns episode record numbers."""
+    return view.select(planner.show_filter(cfg), cfg.get("inprogress_only", False),
+                       cfg.get("skip_specials", True))
+
+
+def select_episodes(shows, cfg):
+    """Apply a profile's filters to index entries. Returns a list of episode dicts."""
+    skip_specials = cfg.get("skip_specials", True)
+    inprogress_only = cfg.get("inprogress_only", False)
+
+    # Apply include/exclude filters
+    accept = planner.show_filter(cfg)
+    tvshow_ids = {sid for sid in shows if accept(sid)}
+
+    eps = []
+    for sid in tvshow_ids:
+        entry = shows[sid]
+        ep = entry.get("inprogress")
+        if not inprogress_only and not ep:
+            ep = entry.get("next_regular" if skip_specials else "next")
+        if ep:
+            eps.append(ep)
+    return eps
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Turn a profile's config into the JSON-RPC queries its live path needs.
+
+Only used when the Next-Up index is not available. The plan pushes what Kodi
+can evaluate itself into the query (season > 0 for skip_specials,
+lastplayed-descending sort, limits) so browse_profile does not fetch and sort
+rows the widget never shows:
+
+    {"key": snapshot name or None, "nextup": bool, "skip_specials": bool|None,
+     "inprogress_limit": shows wanted (0 = all), "page_size": rows per page,
+     "filter_mode": ..., "filter_shows": [...]}
+
+skip_specials=None resolves both Next-Up variants (what the index needs).
+"""
+
+MIN_PAGE_SIZE = 25
+
+FULL_PLAN = {"key": "shows", "nextup": True, "skip_specials": None, "inprogress_limit": 0,
+             "page_size": 0, "filter_mode": "all", "filter_shows": []}
+
+
+def show_filter(cfg):
+    """Return predicate(tvshowid) for the profile's include/exclude filter."""
+    mode = cfg.get("filter_mode", "all")
+    chosen = set(int(x) for x in (cfg.get("filter_shows") or []))
+    if mode == "include" and chosen:
+        return lambda sid: int(sid) in chosen
+    if mode == "exclude" and chosen:
+        return lambda sid: int(sid) not in chosen
+    return lambda sid: True
+
+
+def plan_queries(cfg):
+    inprogress_only = cfg.get("inprogress_only", False)
+    skip_specials = bool(cfg.get("skip_specials", True))
+    max_items = int(cfg.get("max_items", 0) or 0)
+    plan = {
+        "key": None,
+        "nextup": not inprogress_only,
+        "skip_specials": skip_specials,
+        "inprogress_limit": 0,
+        "page_size": 0,
+        "filter_mode": cfg.get("filter_mode", "all"),
+        "filter_shows": list(cfg.get("filter_shows") or []),
+    }
+    paged = inprogress_only and max_items and cfg.get("order_by_recent", True)
+    if paged and plan["filter_mode"] != "include":
+        # Most recent in-progress shows are exactly what the widget renders:
+        # page through lastplayed-desc until max_items shows pass the filter.
+        # (An include list usually matches few shows, paging would walk everything.)
+        plan["inprogress_limit"] = max_items
+        plan["page_size"] = max(max_items * 2, MIN_PAGE_SIZE)
+    else:
+        # Profile independent apart from these flags, so widgets can share a snapshot
+        if inprogress_only:
+            plan["key"] = "shows-inprogress"
+        else:
+            plan["key"] = "shows-nextup-regular" if skip_specials else "shows-nextup-all"
+        plan["filter_mode"] = "all"
+        plan["filter_shows"] = []
+    return plan
@@ -0,0 +1,636 @@
+
+# -*- coding: utf-8 -*-
+"""NextSmart Lists plugin. main.py only calls run(sys.argv).
+
+The plugin runs with reuselanguageinvoker: this module stays imported between
+calls, so nothing per call may live in module globals. Everything that belongs
+to one call (handle, base URL, query) travels in an Invocation.
+"""
+import json, urllib.parse, os, threading, time, bisect
+import xbmc  # type: ignore
+import xbmcgui  # type: ignore
+import xbmcplugin  # type: ignore
+import xbmcaddon  # type: ignore
+import xbmcvfs  # type: ignore
+
+from library import log, rpc, setting, profile_dir, memoized, invalidate_memo
+from listing import load_profiles, forget_profiles, compute_listing, episode_label
+import listcache
+import showcache
+import diagnostics
+import prequeue
+
+ADDON = xbmcaddon.Addon()
+ADDON_ID = ADDON.getAddonInfo('id')
+ADDON_NAME = ADDON.getAddonInfo('name')
+
+# Seconds a cached widget listing may be served while it is being refreshed
+DEFAULT_MAX_STALE = 600
+STALE_CHOICES = [
+    ("Off (always rebuild)", 0),
+    ("5 minutes", 300),
+    ("10 minutes (default)", 600),
+    ("30 minutes", 1800),
+    ("2 hours", 7200),
+]
+MAX_ITEMS_CHOICES = [0, 10, 15, 20, 30, 50, 100]
+DEFAULT_PER_PAGE = 50   # page size when browsing a list inside the addon
+WIDGET_PER_PAGE = 20    # widgets always render this fixed first page
+PAGE_ORDER_TTL = 3600   # seconds later pages may reuse the ordering computed for page 1
+TVSHOWS_TTL = 300       # seconds the show list for the picker is reused within one generation
+SEARCH_MIN_SHOWS = 150  # libraries with more shows get the search-first picker
+
+
+class Invocation(object):
+    """Handle, base URL and query of one plugin call."""
+
+    def __init__(self, argv):
+        self.base_url = argv[0]
+        self.handle = int(argv[1])
+        self.params = urllib.parse.parse_qs(argv[2][1:]) if len(argv) > 2 else {}
+
+
+def build_url(inv, params):
+    return inv.base_url + "?" + urllib.parse.urlencode(params, doseq=True)
+
+# ---------------- UI helpers ----------------
+
+def multiselect_shows(heading, shows, selected):
+    """Multiselect over `shows`; returns the chosen tvshowids among them, or None on cancel."""
+    labels = [s["title"] for s in shows]
+    # Preselect indices based on the current selection
+    pre = [i for i,s in enumerate(shows) if s["tvshowid"] in selected]
+    try:
+        sel = xbmcgui.Dialog().multiselect(heading, labels, preselect=pre)
+    except TypeError:
+        # Older dialog signature fallback
+        sel = xbmcgui.Dialog().multiselect(heading, labels)
+    if sel is None:
+        return None
+    return {shows[i]["tvshowid"] for i in sel}
+
+
+def prefix_matches(shows, keys, prefix):
+    """Shows whose title starts with `prefix`; `keys` are the lowercased titles in `shows` order."""
+    prefix = prefix.strip().lower()
+    lo = bisect.bisect_left(keys, prefix)
+    hi = bisect.bisect_left(keys, prefix + "\uffff")
+    return shows[lo:hi]
+
+
+def pick_shows_multiselect(current_ids=None):
+    """Return list of selected tvshowids (ints)."""
+    current_ids = set(current_ids or [])
+    shows = memoized(("tvshows",), showcache.load_tvshows, TVSHOWS_TTL)
+    if not shows:
+        xbmcgui.Dialog().ok(ADDON_NAME, "No TV shows found in your library.")
+        return []
+    if len(shows) < SEARCH_MIN_SHOWS:
+        sel = multiselect_shows("Choose TV Shows", shows, current_ids)
+        return list(current_ids) if sel is None else sorted(sel)  # cancelled → keep previous
+
+    # Large library: search by title prefix, the selection is kept across searches
+    keys = [s["title"].lower() for s in shows]
+    selected = set(current_ids)
+    kb = xbmcgui.Dialog()
+    while True:
+        choice = kb.select(f"Choose TV Shows ({len(selected)} selected)",
+                           ["Search by title...", f"Review selected ({len(selected)})",
+                            f"Browse all {len(shows)} shows", "Done"])
+        if choice < 0:
+            return list(current_ids)  # cancelled → keep previous
+        if choice == 3:
+            return sorted(selected)
+        if choice == 0:
+            prefix = kb.input("Title starts with", type=xbmcgui.INPUT_ALPHANUM)
+            if not prefix:
+                continue
+            subset = prefix_matches(shows, keys, prefix)
+            if not subset:
+                kb.notification(ADDON_NAME, f"No show starts with \"{prefix}\"", xbmcgui.NOTIFICATION_INFO, 2500)
+                continue
+            heading = f"Shows starting with \"{prefix}\""
+        elif choice == 1:
+            subset = [s for s in shows if s["tvshowid"] in selected]
+            if not subset:
+                continue
+            heading = "Selected shows"
+        else:
+            subset = shows
+            heading = "Choose TV Shows"
+        sel = multiselect_shows(heading, subset, selected)
+        if sel is not None:
+            # Only the shown subset changes, selections outside it stay
+            selected = (selected - {s["tvshowid"] for s in subset}) | sel
+
+
+def add_dir(inv, label, url, is_folder=True, icon=None):
+    li = xbmcgui.ListItem(label=str(label))
+    if icon:
+        li.setArt({"icon": icon, "thumb": icon})
+    xbmcplugin.addDirectoryItem(inv.handle, url, li, isFolder=is_folder)
+
+
+def list_profiles(inv):
+    add_dir(inv, "Add New Smart List", build_url(inv, {"action":"add_profile"}), is_folder=False)
+    profiles = load_profiles()
+    for key, cfg in profiles.items():
+        mode = "In-Progress only" if cfg.get("inprogress_only") else "Next-Up + In-Progress"
+        add_dir(inv, f"{cfg.get('name','List')} • {mode}",
+                build_url(inv, {"action":"browse","profile":key,"per_page":DEFAULT_PER_PAGE}), is_folder=True)
+        add_dir(inv, f"Edit: {cfg.get('name','List')}", build_url(inv, {"action":"edit_profile","profile":key}), is_folder=False)
+    add_dir(inv, "Widget Path Helper", build_url(inv, {"action":"widget_path"}), is_folder=False)
+    add_dir(inv, "Diagnostics", build_url(inv, {"action":"diagnostics"}), is_folder=False)
+    add_dir(inv, "Delete All Lists", build_url(inv, {"action":"wipe"}), is_folder=False)
+    xbmcplugin.endOfDirectory(inv.handle)
+
+
+def widget_path(key):
+    """Widget path of a profile, as shown by add_profile and the Widget Path Helper.
+
+    The refresh parameter changes when a served listing turned out stale (signal_changed).
+    """
+    return (f"plugin://{ADDON_ID}/?action=browse&profile={key}&page=1&per_page={WIDGET_PER_PAGE}&widget=1"
+            f"&refresh=$INFO[Window(Home).Property({refresh_property(key)})]")
+
+
+def widget_path_helper():
+    profs = load_profiles()
+    if not profs:
+        xbmcgui.Dialog().ok(ADDON_NAME, "Create a list first.\nThen return here to copy the widget path.")
+        return
+    lines = []
+    for key, cfg in profs.items():
+        lines.append(f"[{cfg.get('name','List')}] {widget_path(key)}")
+    xbmcgui.Dialog().textviewer("Widget Paths", "\n\n".join(lines))
+
+
+def diagnostics_view():
+    records = diagnostics.load_records(fs_profile_dir())
+    text = diagnostics.report(records, {k: c.get("name", k) for k, c in load_profiles().items()})
+    if not setting("diagnostics") == "true":
+        text = "Recording is off. Enable \"Record timing diagnostics\" in the addon settings.\n\n" + text
+    xbmcgui.Dialog().textviewer("NextSmart Diagnostics", text)
+
+
+def fs_profile_dir():
+    return profile_dir()
+
+
+def save_profiles(d):
+    data_dir = xbmcvfs.translatePath(ADDON.getAddonInfo('profile'))
+    if not xbmcvfs.exists(data_dir):
+        xbmcvfs.mkdirs(data_dir)
+    fp = os.path.join(data_dir, "profiles.json")
+    payload = json.dumps(d, indent=2)
+    with xbmcvfs.File(fp, "w") as f:
+        f.write(bytearray(payload, "utf-8"))
+    forget_profiles()
+
+
+def ask_max_stale(kb, current=DEFAULT_MAX_STALE):
+    """Ask how long a cached listing may be shown while the widget refreshes."""
+    values = [v for _, v in STALE_CHOICES]
+    pre = values.index(current) if current in values else values.index(DEFAULT_MAX_STALE)
+    choice = kb.select("Show cached list while refreshing for up to…",
+                       [label for label, _ in STALE_CHOICES], preselect=pre)
+    return values[choice] if choice >= 0 else current
+
+
+def ask_max_items(kb, current=0):
+    """Ask how many items the list may contain (0 = no limit)."""
+    labels = ["No limit" if n == 0 else f"{n} items" for n in MAX_ITEMS_CHOICES]
+    pre = MAX_ITEMS_CHOICES.index(current) if current in MAX_ITEMS_CHOICES else 0
+    choice = kb.select("Maximum number of items", labels, preselect=pre)
+    return MAX_ITEMS_CHOICES[choice] if choice >= 0 else current
+
+
+def ask_new_profile():
+    kb = xbmcgui.Dialog()
+
+    # 1) List name
+    name = kb.input("List name", type=xbmcgui.INPUT_ALPHANUM, defaultt="NextSmart")
+    if not name:
+        return None
+
+    # 2) Skip specials (Season 0)
+    skip_specials = kb.yesno(
+        "Special Episodes (Season 0)",
+        "Some shows have bonus episodes, trailers, or behind-the-scenes content stored in Season 0.\n\n"
+        "Do you want to skip these and only include regular episodes in this list?",
+        yeslabel="Skip Specials",
+        nolabel="Include Specials"
+    )
+
+    # 3) Episode selection (In-progress vs Next-Up)
+    inprogress_only = kb.yesno(
+        "Episode Selection",
+        "Choose what type of episodes should be shown in this smart list:\n\n"
+        "- Only In-Progress = episodes you have already started but not finished.\n"
+        "- Allow Next-Up = also include the next unwatched episode for each show.",
+        yeslabel="Only In-Progress",
+        nolabel="Allow Next-Up"
+    )
+
+    # 4) Sorting (recent vs none)
+    order_by_recent = kb.yesno(
+        "Sorting Mode",
+        "How should the list be ordered?\n\n"
+        "- Recent First = newest activity or added items appear at the top.\n"
+        "- No Sorting = leave the list in Kodi's natural order.",
+        yeslabel="Recent First",
+        nolabel="No Sorting"
+    )
+
+    # 5) Filter mode (limit to specific shows)
+    choice = kb.select(
+        "Limit to specific shows?",
+        ["All shows (default)", "Include only selected shows", "Exclude selected shows"]
+    )
+    filter_mode = "all"
+    filter_shows = []
+    if choice == 1:
+        filter_mode = "include"
+        filter_shows = pick_shows_multiselect([])
+    elif choice == 2:
+        filter_mode = "exclude"
+        filter_shows = pick_shows_multiselect([])
+
+    # 6) Widget cache (serve stale while refreshing)
+    max_stale = ask_max_stale(kb)
+
+    # 7) Maximum number of items
+    max_items = ask_max_items(kb)
+
+    return {
+        "name": name,
+        "skip_specials": bool(skip_specials),
+        "inprogress_only": bool(inprogress_only),
+        "order_by_recent": bool(order_by_recent),
+        "filter_mode": filter_mode,
+        "filter_shows": filter_shows,
+        "max_stale": max_stale,
+        "max_items": max_items,
+    }
+
+def slugify(s):
+    s = s.strip().lower()
+    out = []
+    for ch in s:
+        if ch.isalnum():
+            out.append(ch)
+        elif ch in " _-":
+            out.append("-")
+    return "-".join(filter(None, "".join(out).split("-"))) or "list"
+
+def add_profile(inv):
+    prof = ask_new_profile()
+    if not prof:
+        return xbmcplugin.endOfDirectory(inv.handle)
+    profiles = load_profiles()
+    key = slugify(prof["name"])
+    base = key; i = 2
+    while key in profiles:
+        key = f"{base}-{i}"; i += 1
+    profiles[key] = prof
+    save_profiles(profiles)
+    xbmcgui.Dialog().ok(ADDON_NAME, f"Created list '{prof['name']}'\n\nWidget path:\n{widget_path(key)}")
+    list_profiles(inv)
+
+# ---------------- Browse / Build items ----------------
+
+def page_slice(inv, eps, profile_key, page=1, per_page=0, widget=False):
+    """Return (episodes of the requested page, URL of the next page or None)."""
+    if per_page <= 0:
+        return eps, None
+    start = (page - 1) * per_page
+    next_url = None
+    if not widget and len(eps) > start + per_page:
+        next_url = build_url(inv, {"action":"browse","profile":profile_key,"page":page + 1,"per_page":per_page})
+    return eps[start:start + per_page], next_url
+
+
+def build_episode_item(inv, ep, via_playlist=False):
+    """Return (url, ListItem, isFolder) for one episode dict.
+
+    via_playlist: link the play action instead of the file ("prequeue_next").
+    """
+    s = int(ep.get("season", 0)); e = int(ep.get("episode", 0))
+    label = episode_label(ep)
+    # offscreen: the item is only handed to Kodi, never shown while we build it
+    li = xbmcgui.ListItem(label=label, offscreen=True)
+    if not via_playlist:
+        # With "prequeue_next" the play action starts the episode itself, through the video playlist
+        li.setProperty("IsPlayable", "true")
+    tag = li.getVideoInfoTag()
+    tag.setMediaType("episode")
+    tag.setTitle(ep.get("title",""))
+    tag.setTvShowTitle(ep.get("showtitle",""))
+    tag.setSeason(s)
+    tag.setEpisode(e)
+
+    # --- Progress info for widgets/skins ---
+    resume = ep.get("resume") or {}
+    try:
+        pos = int(float(resume.get("position", 0)))
+        tot = int(float(resume.get("total", 0)))
+    except Exception:
+        pos = int(resume.get("position") or 0)
+        tot = int(resume.get("total") or 0)
+
+    if tot > 0 and pos > 0:
+        tag.setResumePoint(pos, tot)
+        # Common skin properties used for progress bars
+        percent = int((pos / float(tot)) * 100)
+        li.setProperties({
+            "resumetime": str(pos),
+            "totaltime": str(tot),
+            "PercentPlayed": str(percent),
+            "progress": str(percent),
+        })
+    art = ep.get("art") or {}
+    li.setArt({"thumb": art.get("thumb",""), "fanart": art.get("fanart","")})
+
+    # Prefer direct file path; else fall back to JSON-RPC play by episodeid (implicitly present)
+    url = None if via_playlist else ep.get("file")
+    url = url or build_url(inv, {"action":"play", "episodeid": ep.get("episodeid", 0)})
+    return url, li, False
+
+
+def render_listing(inv, eps, next_url=None):
+    with diagnostics.Stage("render") as st:
+        via_playlist = prequeue.enabled()
+        items = [build_episode_item(inv, ep, via_playlist) for ep in eps]
+        if next_url:
+            items.append((next_url, xbmcgui.ListItem(label="Next page", offscreen=True), True))
+        # One call for the whole list instead of one addDirectoryItem per item
+        xbmcplugin.addDirectoryItems(inv.handle, items, len(items))
+        xbmcplugin.setContent(inv.handle, "episodes")
+        # Lists change with every watched episode; caching them to disc only serves outdated items
+        xbmcplugin.endOfDirectory(inv.handle, cacheToDisc=False)
+        st.items = len(eps)
+    return len(eps)
+
+
+def stale_deadline():
+    """Seconds a browse waits for a fresh listing before serving the cached one."""
+    try:
+        return max(0, int(setting("stale_deadline") or 300)) / 1000.0
+    except ValueError:
+        return 0.3
+
+
+def save_listing(profile_key, cfg, eps):
+    """Cache a computed listing; a failed write only costs the next cache hit."""
+    try:
+        listcache.save_listing(profile_key, cfg, eps)
+    except OSError as e:
+        log(f"saving the listing cache failed for {profile_key}: {e}")
+
+
+def browse_profile(inv, profile_key, page=1, per_page=0, widget=False):
+    cfg = load_profiles().get(profile_key)
+    if not cfg:
+        xbmcgui.Dialog().notification(ADDON_NAME, "Profile not found", xbmcgui.NOTIFICATION_ERROR, 4000)
+        return xbmcplugin.endOfDirectory(inv.handle)
+
+    started = time.perf_counter()
+    diagnostics.set_profile(profile_key)
+
+    def show(eps):
+        count = render_listing(inv, *page_slice(inv, eps, profile_key, page, per_page, widget))
+        # Time until the listing reached Kodi, a background refresh is not included
+        diagnostics.record("browse", profile_key, time.perf_counter() - started, items=count)
+        return count
+
+    max_stale = int(cfg.get("max_stale", DEFAULT_MAX_STALE))
+    if page > 1:
+        # Later pages reuse the ordering saved when page 1 was built
+        cached = listcache.load_listing(profile_key, cfg)
+        if cached is not None and cached[1] <= max(max_stale, PAGE_ORDER_TTL):
+            log(f"page {page} from cached ordering: {profile_key} (age {cached[1]}s)")
+            return show(cached[0])
+
+    cached = listcache.load_listing(profile_key, cfg) if max_stale > 0 else None
+    if cached is None or cached[1] > max_stale:
+        log(f"listing cache miss: {profile_key}" + (f" (age {cached[1]}s)" if cached else ""))
+        eps = compute_listing(cfg)
+        save_listing(profile_key, cfg, eps)
+        return show(eps)
+
+    # Serve stale: give the refresh a short deadline, otherwise render the cached
+    # listing right away and finish the refresh after the directory is closed.
+    stale_eps, age = cached
+    result = {}
+
+    def refresh():
+        try:
+            result["eps"] = compute_listing(cfg)
+        except Exception as e:
+            result["error"] = e
+
+    worker = threading.Thread(target=refresh)
+    worker.daemon = True
+    worker.start()
+    worker.join(stale_deadline())
+    if not worker.is_alive():
+        if "error" in result:
+            raise result["error"]
+        log(f"listing cache refreshed within deadline: {profile_key} (age {age}s)")
+        save_listing(profile_key, cfg, result["eps"])
+        return show(result["eps"])
+
+    log(f"listing cache hit: {profile_key} (age {age}s)")
+    show(stale_eps)
+    worker.join()
+    if "error" in result:
+        log(f"background refresh failed for {profile_key}: {result['error']}")
+        return
+    save_listing(profile_key, cfg, result["eps"])
+    if result["eps"] != stale_eps:
+        signal_changed(profile_key, widget)
+
+
+def refresh_property(profile_key):
+    return f"NextSmart.{profile_key}.Refresh"
+
+
+def signal_changed(profile_key, widget):
+    """Get a listing that changed after it was served shown again.
+
+    Container.Refresh reloads whichever container has focus, so it is only
+    used when this profile's listing is the active container. Widgets get a
+    new value in a home-window property instead; the widget path from the
+    Widget Path Helper carries it, so only that widget reloads.
+    """
+    if widget:
+        log(f"listing changed, signalling widget: {profile_key}")
+        xbmcgui.Window(10000).setProperty(refresh_property(profile_key), str(time.time()))
+        return
+    path = xbmc.getInfoLabel("Container.FolderPath")
+    if path.startswith(f"plugin://{ADDON_ID}/") and \
+            urllib.parse.parse_qs(urllib.parse.urlparse(path).query).get("profile") == [profile_key]:
+        log(f"listing changed, refreshing container: {profile_key}")
+        xbmc.executebuiltin("Container.Refresh")
+
+
+def edit_profile(inv, profile_key):
+    profiles = load_profiles()
+    cfg = profiles.get(profile_key)
+    if not cfg:
+        xbmcgui.Dialog().notification(ADDON_NAME, "Profile not found", xbmcgui.NOTIFICATION_ERROR, 3000)
+        list_profiles(inv)
+        return
+
+    kb = xbmcgui.Dialog()
+
+    # Current values with safe fallbacks
+    cur_name = cfg.get("name", "NextSmart")
+    cur_skip = bool(cfg.get("skip_specials", True))
+    cur_inprog = bool(cfg.get("inprogress_only", False))  # False => Allow Next-Up
+    cur_recent = bool(cfg.get("order_by_recent", True))
+
+    # 1) Rename
+    name = kb.input("List name", type=xbmcgui.INPUT_ALPHANUM, defaultt=cur_name) or cur_name
+
+    # 2) Skip specials (Season 0) — explanatory wording
+    skip_specials = kb.yesno(
+        "Special Episodes (Season 0)",
+        "Some shows have bonus episodes, trailers, or behind-the-scenes content stored in Season 0.\n\n"
+        "Do you want to skip these and only include regular episodes in this list?\n\n"
+        f"Current: {'Skip Specials' if cur_skip else 'Include Specials'}",
+        yeslabel="Skip Specials",
+        nolabel="Include Specials"
+    )
+
+    # 3) Episode selection — In-progress vs Next-Up
+    inprogress_only = kb.yesno(
+        "Episode Selection",
+        "Choose what type of episodes should be shown in this smart list:\n\n"
+        "- Only In-Progress = episodes you have already started but not finished.\n"
+        "- Allow Next-Up = also include the next unwatched episode for each show.\n\n"
+        f"Current: {'Only In-Progress' if cur_inprog else 'Allow Next-Up'}",
+        yeslabel="Only In-Progress",
+        nolabel="Allow Next-Up"
+    )
+
+    # 4) Sorting — Recent vs none
+    order_by_recent = kb.yesno(
+        "Sorting Mode",
+        "How should the list be ordered?\n\n"
+        "- Recent First = newest activity or added items appear at the top.\n"
+        "- No Sorting = leave the list in Kodi's natural order.\n\n"
+        f"Current: {'Recent First' if cur_recent else 'No Sorting'}",
+        yeslabel="Recent First",
+        nolabel="No Sorting"
+    )
+
+    # 5) Filter mode — include/exclude specific shows
+    modes = [
+        "All shows (default)",
+        "Include only selected shows",
+        "Exclude selected shows",
+    ]
+    current_mode = cfg.get("filter_mode", "all")
+    pre_idx = 0 if current_mode == "all" else (1 if current_mode == "include" else 2)
+    choice = kb.select("Limit to specific shows?", modes, preselect=pre_idx)
+
+    filter_mode = "all"
+    filter_shows = cfg.get("filter_shows", []) or []
+    if choice == 1:
+        filter_mode = "include"
+        filter_shows = pick_shows_multiselect(filter_shows)
+    elif choice == 2:
+        filter_mode = "exclude"
+        filter_shows = pick_shows_multiselect(filter_shows)
+    else:
+        filter_mode = "all"
+        filter_shows = []
+
+    # 6) Widget cache (serve stale while refreshing)
+    max_stale = ask_max_stale(kb, int(cfg.get("max_stale", DEFAULT_MAX_STALE)))
+
+    # 7) Maximum number of items
+    max_items = ask_max_items(kb, int(cfg.get("max_items", 0) or 0))
+
+    # Save back
+    cfg.update({
+        "name": name,
+        "skip_specials": bool(skip_specials),
+        "inprogress_only": bool(inprogress_only),
+        "order_by_recent": bool(order_by_recent),
+        "filter_mode": filter_mode,
+        "filter_shows": [int(x) for x in filter_shows],
+        "max_stale": max_stale,
+        "max_items": max_items,
+    })
+    profiles[profile_key] = cfg
+    save_profiles(profiles)
+
+    xbmcgui.Dialog().ok(ADDON_NAME, f"List '{name}' updated.")
+    list_profiles(inv)
+
+# ---------------- Router ----------------
+
+def route(inv, qs):
+    action = qs.get("action", ["root"])[0]
+    if action == "root":
+        list_profiles(inv)
+    elif action == "add_profile":
+        add_profile(inv)
+    elif action == "wipe":
+        pdir = fs_profile_dir()
+        fp = os.path.join(pdir, "profiles.json")
+        try:
+            if os.path.exists(fp):
+                os.remove(fp)
+            listcache.clear_listings()
+            showcache.clear_tvshows()
+            invalidate_memo()
+            xbmcgui.Dialog().notification(ADDON_NAME, "All lists deleted", xbmcgui.NOTIFICATION_INFO, 2500)
+        except Exception as e:
+            xbmcgui.Dialog().notification(ADDON_NAME, f"Delete failed: {e}", xbmcgui.NOTIFICATION_ERROR, 3000)
+        list_profiles(inv)
+    elif action == "edit_profile":
+        key = qs.get("profile", [""])[0]
+        edit_profile(inv, key)
+        return
+    elif action == "browse":
+        profile_key = qs.get("profile", [""])[0]
+        try:
+            page = max(1, int(qs.get("page", ["1"])[0]))
+            per_page = max(0, int(qs.get("per_page", ["0"])[0]))
+        except ValueError:
+            page, per_page = 1, 0
+        widget = qs.get("widget", ["0"])[0] == "1"
+        browse_profile(inv, profile_key, page, per_page, widget)
+    elif action == "widget_path":
+        widget_path_helper()
+    elif action == "diagnostics":
+        diagnostics_view()
+    elif action == "play":
+        eid = int(qs.get("episodeid", [0])[0])
+        if eid:
+            if prequeue.enabled():
+                prequeue.play_episode(eid)
+            else:
+                rpc("Player.Open", {"item": {"episodeid": eid}})
+        else:
+            xbmcgui.Dialog().notification(ADDON_NAME, "Missing episode id", xbmcgui.NOTIFICATION_ERROR, 3000)
+        return
+    else:
+        xbmcplugin.endOfDirectory(inv.handle)
+
+
+def run(argv):
+    inv = Invocation(argv)
+    if setting("diagnostics") == "true":
+        diagnostics.start(fs_profile_dir())
+    try:
+        route(inv, inv.params)
+    except Exception as e:
+        xbmcgui.Dialog().notification(ADDON_NAME, f"Error: {e}", xbmcgui.NOTIFICATION_ERROR, 5000)
+        log(f"Exception: {e}")
+        raise
+    finally:
+        diagnostics.stop()
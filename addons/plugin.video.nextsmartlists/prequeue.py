@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Queue the following episode while a NextSmart item plays.
+
+With the "prequeue_next" setting on, the service reacts to Player.OnAVStart
+of an episode listed by a profile (its cached listing or its published
+window properties): the episode after it, picked with that profile's
+skip_specials like get_first_unplayed_episode, is put behind it in the
+video playlist so Kodi continues without a trip back to the widget. While
+the setting is on, NextSmart items run the plugin's play action, which
+starts the episode from the video playlist (play_episode) so there is a
+position to insert behind; with it off they play their file directly.
+
+Once playback passes WATCHED_PERCENT the show's index entry is advanced as
+if the episode were watched already; Kodi itself only marks it on stop.
+"""
+import xbmc  # type: ignore
+
+from library import setting, log, rpc, get_episode_show_id, get_first_unplayed_episode
+from listing import load_profiles
+import listcache
+
+VIDEO_PLAYER = 1
+VIDEO_PLAYLIST = 1
+# Kodi's default playcountminimumpercent
+WATCHED_PERCENT = 90
+# Queued episodes remembered until they start playing
+MAX_QUEUED = 20
+
+
+def enabled():
+    return setting("prequeue_next") == "true"
+
+
+def episode_details(episode_id):
+    r = rpc("VideoLibrary.GetEpisodeDetails", {
+        "episodeid": int(episode_id),
+        "properties": ["tvshowid", "season", "episode", "file"],
+    })
+    return r.get("episodedetails") or {}
+
+
+def play_episode(episode_id):
+    """Start an episode from the video playlist, keeping what is queued there.
+
+    While the playlist plays, the episode goes right after the current item;
+    otherwise it is added at the end. Resuming is left to Kodi's default.
+    """
+    item = {"episodeid": int(episode_id)}
+    props = {}
+    if rpc("Player.GetActivePlayers", {}):
+        props = rpc("Player.GetProperties", {"playerid": VIDEO_PLAYER, "properties": ["playlistid", "position"]})
+    if props.get("playlistid") == VIDEO_PLAYLIST and int(props.get("position", -1)) >= 0:
+        position = int(props["position"]) + 1
+        rpc("Playlist.Insert", {"playlistid": VIDEO_PLAYLIST, "position": position, "item": item})
+    else:
+        position = int(rpc("Playlist.GetProperties", {"playlistid": VIDEO_PLAYLIST,
+                                                      "properties": ["size"]}).get("size", 0))
+        rpc("Playlist.Add", {"playlistid": VIDEO_PLAYLIST, "item": item})
+    rpc("Player.Open", {"item": {"playlistid": VIDEO_PLAYLIST, "position": position}})
+
+
+def queue_after_current(player_id, following):
+    """Put `following` right after the playing item. Returns False when it is not queued (again)."""
+    props = rpc("Player.GetProperties", {"playerid": player_id, "properties": ["playlistid", "position"]})
+    playlist = props.get("playlistid", VIDEO_PLAYLIST)
+    position = int(props.get("position", -1))
+    if playlist < 0 or position < 0:
+        # Not started from a playlist (e.g. an old widget item with a bare file URL)
+        log("prequeue: the playing item is not in a playlist")
+        return False
+    item = {"episodeid": int(following["episodeid"])}
+    items = rpc("Playlist.GetItems", {"playlistid": playlist}).get("items") or []
+    nxt = items[position + 1] if position + 1 < len(items) else {}
+    if nxt.get("type") == "episode" and int(nxt.get("id", 0)) == item["episodeid"]:
+        return False
+    rpc("Playlist.Insert", {"playlistid": playlist, "position": position + 1, "item": item})
+    return True
+
+
+class PlaybackTracker(object):
+    """The NextSmart episode currently playing, between OnAVStart and OnStop."""
+
+    def __init__(self):
+        self.current = None   # episode details + "profile"
+        self.advanced = False
+        self.queued = {}      # episodeid -> profile key of episodes this tracker queued
+
+    def start(self, episode_id, player_id, listed):
+        """Handle OnAVStart; `listed` maps episodeid -> profile key of NextSmart items."""
+        self.current = None
+        # Queued episodes count as listed, so a whole run of episodes keeps chaining
+        profile = listed.get(int(episode_id)) or self.queued.pop(int(episode_id), None)
+        if profile is None:
+            return
+        cfg = load_profiles().get(profile) or {}
+        current = episode_details(episode_id)
+        sid = current.get("tvshowid")
+        if sid is None or sid < 0:
+            sid = get_episode_show_id(episode_id)
+        if sid is None:
+            return
+        self.current = dict(current, episodeid=int(episode_id), tvshowid=int(sid), profile=profile)
+        self.advanced = False
+        following = get_first_unplayed_episode(
+            sid, cfg.get("skip_specials", True),
+            after=(int(current.get("season", 0)), int(current.get("episode", 0))))
+        if following is None:
+            log(f"prequeue: nothing after episode {episode_id}")
+            return
+        self.queued[int(following["episodeid"])] = profile
+        while len(self.queued) > MAX_QUEUED:
+            self.queued.pop(next(iter(self.queued)))
+        if queue_after_current(player_id, following):
+            log(f"prequeue: episode {following['episodeid']} queued after {episode_id} ({profile})")
+
+    def stop(self):
+        # queued is kept: Kodi also reports OnStop between two playlist items
+        self.current = None
+
+    def crossed_threshold(self):
+        """True once per item when playback passes WATCHED_PERCENT."""
+        if self.current is None or self.advanced:
+            return False
+        player = xbmc.Player()
+        try:
+            if not player.isPlayingVideo():
+                return False
+            total = player.getTotalTime()
+            if total <= 0 or player.getTime() * 100.0 / total < WATCHED_PERCENT:
+                return False
+        except RuntimeError:
+            return False
+        self.advanced = True
+        return True
+
+
+def listed_episodes(publisher):
+    """{episodeid: profile key} of everything the profiles currently list."""
+    listed = listcache.listed_episodes()
+    for eid, key in publisher.listed_episodes().items():
+        listed.setdefault(eid, key)
+    return listed
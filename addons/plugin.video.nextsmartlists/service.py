@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Background service that keeps the Next-Up index (nextup.py) up to date.
+
+Library and player notifications only queue the affected tvshowids; the main
+loop recomputes those shows after a short debounce and rewrites the index.
+
+Clients sharing a MySQL library get no notifications for each other's
+changes, so every "sync_interval" seconds the loop also runs a delta sync
+against the index watermarks. Every FULL_SYNC_SECONDS it rebuilds the index
+in full, also with the delta sync off: only the rebuild sees removals and
+episodes marked unwatched elsewhere.
+
+After each index update (and when profiles.json changes) the loop republishes
+the profiles' listings as home-window properties if enabled (widgetprops.py)
+and queues their uncached artwork for warming (artwarm.py).
+
+Player.OnAVStart of a NextSmart item queues the show's following episode
+and advances its index entry at the watched threshold (prequeue.py).
+"""
+import os
+import json
+import time
+import xbmc  # type: ignore
+
+from library import setting, log, get_episode_show_id, bump_generation, profile_dir
+import diagnostics
+import nextup
+import listing
+import widgetprops
+import artwarm
+import prequeue
+
+DEBOUNCE_SECONDS = 2
+DEFAULT_SYNC_INTERVAL = 120
+FULL_SYNC_SECONDS = 6 * 3600
+DIAGNOSTICS_ROTATE_SECONDS = 3600
+
+
+def sync_interval():
+    """Seconds between delta syncs (setting "sync_interval"), 0 = off."""
+    try:
+        return max(0, int(setting("sync_interval") or DEFAULT_SYNC_INTERVAL))
+    except ValueError:
+        return DEFAULT_SYNC_INTERVAL
+
+
+class NextUpMonitor(xbmc.Monitor):
+
+    def __init__(self):
+        super().__init__()
+        self.rebuild = False
+        self.sync = False       # run a delta sync against the index marks
+        self.episodes = set()   # episodeids whose show must be recomputed
+        self.removed = set()    # episodeids removed from the library
+        self.shows = set()      # tvshowids to recompute
+        self.av_started = None  # (episodeid, playerid) of the last Player.OnAVStart
+        self.stopped = False
+        self.settings_changed = False
+
+    def onSettingsChanged(self):
+        self.settings_changed = True
+
+    def onNotification(self, sender, method, data):
+        if sender != "xbmc":
+            return
+        if method == "Player.OnAVStart":
+            self.on_av_start(data)
+            return
+        if method == "Player.OnStop":
+            self.stopped = True
+        if method in ("VideoLibrary.OnScanFinished", "VideoLibrary.OnCleanFinished"):
+            self.rebuild = True
+            return
+        if method not in ("VideoLibrary.OnUpdate", "VideoLibrary.OnRemove", "Player.OnStop"):
+            return
+        try:
+            payload = json.loads(data) if data else {}
+        except ValueError:
+            return
+        # OnUpdate/OnStop wrap the item, OnRemove sends it bare
+        item = payload.get("item", payload) if isinstance(payload, dict) else {}
+        kind = item.get("type")
+        item_id = item.get("id")
+        if item_id is None:
+            return
+        if kind == "episode":
+            (self.removed if method == "VideoLibrary.OnRemove" else self.episodes).add(int(item_id))
+        elif kind == "tvshow":
+            self.shows.add(str(item_id))
+
+    def on_av_start(self, data):
+        try:
+            payload = json.loads(data) if data else {}
+        except ValueError:
+            return
+        item = payload.get("item") or {}
+        if item.get("type") == "episode" and item.get("id") is not None:
+            player_id = (payload.get("player") or {}).get("playerid", prequeue.VIDEO_PLAYER)
+            self.av_started = (int(item["id"]), player_id)
+        else:
+            self.av_started = None
+
+    def pending(self):
+        return self.rebuild or self.sync or self.episodes or self.removed or self.shows
+
+    def advance(self, tracker):
+        """Move the playing show's entry past the current episode."""
+        index = nextup.load_index()
+        if index is None:
+            return False
+        cur = tracker.current
+        if not nextup.advance_show(index, cur["tvshowid"], cur["episodeid"]):
+            return False
+        nextup.save_index(index)
+        bump_generation()
+        log(f"next-up index advanced past episode {cur['episodeid']} (show {cur['tvshowid']})")
+        return True
+
+    def process(self):
+        """Apply the queued changes; True if the index or its marks changed."""
+        # Swap the queues first so notifications arriving meanwhile are kept for the next pass
+        rebuild, self.rebuild = self.rebuild, False
+        sync, self.sync = self.sync, False
+        episodes, self.episodes = self.episodes, set()
+        removed, self.removed = self.removed, set()
+        shows, self.shows = self.shows, set()
+
+        index = None if rebuild else nextup.load_index()
+        if index is None:
+            nextup.rebuild_index()
+            bump_generation()
+            return True
+
+        marks = dict(index.get("marks") or {})
+        if sync:
+            synced = nextup.delta_sync(index)
+            if synced is None:
+                nextup.rebuild_index()
+                bump_generation()
+                return True
+            shows |= synced
+
+        for eid in episodes:
+            sid = get_episode_show_id(eid) or nextup.find_show_by_episode(index, eid)
+            if sid:
+                shows.add(sid)
+        for eid in removed:
+            sid = nextup.find_show_by_episode(index, eid)
+            if sid:
+                shows.add(sid)
+
+        changed = [sid for sid in shows if nextup.refresh_show(index, sid)]
+        if not changed and index.get("marks") == marks:
+            return False
+        nextup.save_index(index)
+        if changed:
+            log(f"next-up index updated for shows: {', '.join(sorted(changed))}")
+        # New marks mean something was played or added: memoized lookups are outdated too
+        bump_generation()
+        return True
+
+
+def file_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def run():
+    monitor = NextUpMonitor()
+    publisher = widgetprops.PropertyPublisher()
+    warmer = artwarm.ArtWarmer()
+    tracker = prequeue.PlaybackTracker()
+    publish_due = warm_due = True
+    profiles_key = None
+    if nextup.load_index() is None:
+        monitor.rebuild = True
+    last_sync = last_full = time.time()
+    last_rotate = 0
+    while not monitor.abortRequested():
+        if monitor.waitForAbort(DEBOUNCE_SECONDS):
+            break
+        now = time.time()
+        interval = sync_interval()
+        if now - last_full >= FULL_SYNC_SECONDS:
+            monitor.rebuild = True
+            last_full = last_sync = now
+        elif interval and now - last_sync >= interval:
+            monitor.sync = True
+            last_sync = now
+        if now - last_rotate >= DIAGNOSTICS_ROTATE_SECONDS:
+            last_rotate = now
+            try:
+                diagnostics.rotate(profile_dir())
+            except OSError as e:
+                log(f"rotating the diagnostics file failed: {e}")
+        if monitor.stopped:
+            monitor.stopped = False
+            tracker.stop()
+        if monitor.av_started is not None:
+            started, monitor.av_started = monitor.av_started, None
+            if prequeue.enabled():
+                try:
+                    tracker.start(started[0], started[1], prequeue.listed_episodes(publisher))
+                except Exception as e:
+                    log(f"queueing the next episode failed: {e}")
+        if tracker.crossed_threshold():
+            try:
+                if monitor.advance(tracker):
+                    publish_due = warm_due = True
+            except Exception as e:
+                log(f"advancing the next-up index failed: {e}")
+        if monitor.pending():
+            try:
+                if monitor.process():
+                    publish_due = warm_due = True
+            except Exception as e:
+                log(f"next-up index update failed: {e}")
+
+        # Settings such as publish_items or prequeue_next change what is published
+        if monitor.settings_changed:
+            monitor.settings_changed = False
+            publish_due = warm_due = True
+
+        # Listings change with the index or when a profile is added/edited
+        key = file_key(listing.profiles_path())
+        if key != profiles_key:
+            profiles_key = key
+            publish_due = warm_due = True
+
+        if not widgetprops.enabled():
+            if publisher.published:
+                publisher.clear()
+                publish_due = True
+        elif publish_due:
+            try:
+                publisher.publish()
+                publish_due = False
+            except Exception as e:
+                log(f"publishing window properties failed: {e}")
+
+        if not artwarm.enabled():
+            warmer.cancel()
+            warm_due = True
+        elif warm_due and not xbmc.Player().isPlaying():
+            try:
+                warmer.refresh()
+                warm_due = False
+            except Exception as e:
+                log(f"art warming failed: {e}")
+        else:
+            warmer.step(monitor)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""TV show list for the show picker, persisted between plugin calls.
+
+tvshows.json in the addon profile dir keeps the list together with the
+library marker it was read at:
+
+    {"marker": "<show count>|<newest dateadded>", "shows": [{"tvshowid": id, "title": str}]}
+
+While the marker is unchanged (one single-row query) the picker skips the
+full GetTVShows call. A renamed show does not move the marker; the list
+catches up with the next added or removed show. Refreshes run under the
+same file lock as the snapshots, so concurrent pickers fetch the list once.
+"""
+import os, json
+
+from library import log, profile_dir, get_all_tvshows, get_show_marker
+from snapshot import FileLock
+
+CACHE_FILE = "tvshows.json"
+
+
+def _path():
+    return os.path.join(profile_dir(), CACHE_FILE)
+
+
+def _load():
+    try:
+        with open(_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def load_tvshows():
+    """Return [{"tvshowid": id, "title": str}] sorted by title."""
+    marker = get_show_marker()
+    cached = _load()
+    if cached is not None and cached.get("marker") == marker:
+        log(f"show list from cache ({len(cached.get('shows') or [])} shows)")
+        return cached.get("shows") or []
+    with FileLock(_path() + ".lock"):
+        # Another invocation may have refreshed it while we were waiting
+        cached = _load()
+        if cached is not None and cached.get("marker") == marker:
+            log(f"show list reused after wait ({len(cached.get('shows') or [])} shows)")
+            return cached.get("shows") or []
+        shows = get_all_tvshows()
+        tmp = _path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"marker": marker, "shows": shows}, f)
+        os.replace(tmp, _path())
+    log(f"show list refreshed ({len(shows)} shows)")
+    return shows
+
+
+def clear_tvshows():
+    try:
+        os.remove(_path())
+    except OSError:
+        pass
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Library snapshots shared between concurrent plugin invocations.
+
+When a skin refreshes several NextSmart widgets at once, Kodi starts one
+main.py per widget. shared() lets the first invocation query the library
+while the others wait on a lock file and reuse its result (single-flight).
+Snapshots are shows dicts stored as snapshots/<name>.bin (binindex format)
+and expire after a short TTL.
+"""
+import os, time
+
+from library import log, profile_dir
+import binindex
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_TTL = 30       # seconds a snapshot is reused
+LOCK_STALE = 60         # seconds after which a left-over lock is broken
+LOCK_POLL = 0.05
+
+
+def _path(name):
+    sdir = os.path.join(profile_dir(), SNAPSHOT_DIR)
+    if not os.path.isdir(sdir):
+        os.makedirs(sdir, exist_ok=True)
+    return os.path.join(sdir, f"{name}.bin")
+
+
+class FileLock(object):
+    """Cross-process lock based on O_EXCL file creation (works on every Kodi platform)."""
+
+    def __init__(self, path, timeout=LOCK_STALE):
+        self.path = path
+        self.timeout = timeout
+
+    def __enter__(self):
+        start = time.time()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode("ascii"))
+                os.close(fd)
+                return self
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.path.getmtime(self.path) > LOCK_STALE:
+                    log(f"breaking stale lock {os.path.basename(self.path)}")
+                    os.remove(self.path)
+                    continue
+            except OSError:
+                continue  # released meanwhile
+            if time.time() - start > self.timeout:
+                raise RuntimeError(f"timed out waiting for {os.path.basename(self.path)}")
+            time.sleep(LOCK_POLL)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _read_fresh(fp, ttl):
+    try:
+        if time.time() - os.path.getmtime(fp) > ttl:
+            return None
+        return binindex.read(fp)
+    except (OSError, binindex.FormatError):
+        return None
+
+
+def shared(name, build, ttl=SNAPSHOT_TTL):
+    """Return a binindex.IndexView of build() (a shows dict) for snapshot `name`.
+
+    build() runs at most once per TTL across processes.
+    """
+    fp = _path(name)
+    view = _read_fresh(fp, ttl)
+    if view is not None:
+        log(f"snapshot hit: {name}")
+        return view
+    with FileLock(fp + ".lock"):
+        # Another invocation may have built it while we were waiting
+        view = _read_fresh(fp, ttl)
+        if view is not None:
+            log(f"snapshot reused after wait: {name}")
+            return view
+        data = binindex.encode(build())
+        tmp = fp + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, fp)
+        log(f"snapshot built: {name}")
+        return binindex.IndexView(data)
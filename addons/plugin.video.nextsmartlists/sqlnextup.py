@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Optional read-only SQL backend for the Next-Up shows.
+
+Instead of JSON-RPC, build_shows() here reads the candidates for every show
+with one windowed query over Kodi's episode_view:
+
+  - the local MyVideos<N>.db (SQLite) in special://database/, or
+  - the shared MySQL/MariaDB library configured by plugin.program.libretto.setup
+    (needs the pymysql or mysql.connector module).
+
+The result has the same shape as nextup.build_shows() and the episode dicts
+match what the JSON-RPC queries return for EPISODE_PROPS. Any failure (no
+database, no driver, older schema) returns None and the caller falls back to
+JSON-RPC; the backend is then not retried for RETRY_SECONDS.
+
+tools/myvideos_fixture.py builds a SQLite fixture from the fake library and
+compares both backends.
+"""
+import os, re, glob, time, sqlite3
+import xbmcaddon  # type: ignore
+import xbmcvfs  # type: ignore
+
+from library import setting, log
+import diagnostics
+
+SETUP_ADDON_ID = "plugin.program.libretto.setup"
+BACKEND_OFF, BACKEND_SQLITE, BACKEND_MYSQL = "0", "1", "2"
+RETRY_SECONDS = 300
+
+_failed = {"until": 0.0}
+
+# Both dialects: MariaDB >= 10.2, SQLite >= 3.25 (window functions and CTEs)
+EPISODE_COLS = (
+    "ev.idEpisode, ev.c00, ev.c12, ev.c13, ev.idShow, ev.strTitle, ev.playCount, ev.lastPlayed, "
+    "ev.dateAdded, ev.strPath, ev.strFileName, ev.c09, ev.resumeTimeInSeconds, ev.totalTimeInSeconds"
+)
+
+CANDIDATES_SQL = """
+WITH started AS (
+    SELECT idShow FROM episode_view WHERE playCount > 0 GROUP BY idShow
+)
+SELECT t.*,
+    (SELECT url FROM art WHERE media_id = t.idEpisode AND media_type = 'episode' AND type = 'thumb'),
+    (SELECT url FROM art WHERE media_id = t.idShow AND media_type = 'tvshow' AND type = 'fanart'),
+    (SELECT url FROM art WHERE media_id = t.idShow AND media_type = 'tvshow' AND type = 'poster')
+FROM (
+    SELECT 'inprogress' AS kind, {cols},
+        CASE WHEN ev.idShow IN (SELECT idShow FROM started) THEN 1 ELSE 0 END AS started,
+        ROW_NUMBER() OVER (PARTITION BY ev.idShow ORDER BY ev.lastPlayed DESC, ev.idEpisode) AS rn
+    FROM episode_view ev
+    WHERE ev.resumeTimeInSeconds > 0
+    UNION ALL
+    SELECT 'next' AS kind, {cols}, 1 AS started,
+        ROW_NUMBER() OVER (PARTITION BY ev.idShow
+                           ORDER BY CAST(ev.c12 AS {int}), CAST(ev.c13 AS {int}), ev.idEpisode) AS rn
+    FROM episode_view ev
+    WHERE COALESCE(ev.playCount, 0) = 0 AND ev.idShow IN (SELECT idShow FROM started)
+    UNION ALL
+    SELECT 'next_regular' AS kind, {cols}, 1 AS started,
+        ROW_NUMBER() OVER (PARTITION BY ev.idShow
+                           ORDER BY CAST(ev.c12 AS {int}), CAST(ev.c13 AS {int}), ev.idEpisode) AS rn
+    FROM episode_view ev
+    WHERE COALESCE(ev.playCount, 0) = 0 AND CAST(ev.c12 AS {int}) > 0
+      AND ev.idShow IN (SELECT idShow FROM started)
+) t
+WHERE t.rn = 1
+"""
+
+INT_TYPE = {"sqlite": "INTEGER", "mysql": "SIGNED"}
+
+
+def backend():
+    """Configured backend (setting "sql_backend"), one of the BACKEND_* values."""
+    return setting("sql_backend") or BACKEND_OFF
+
+
+def enabled():
+    return backend() != BACKEND_OFF and time.time() >= _failed["until"]
+
+
+def _newest(names, prefix="MyVideos"):
+    """Pick the <prefix><N> name with the highest schema version N."""
+    pattern = re.compile(re.escape(prefix) + r"(\d+)")
+
+    def version(name):
+        m = pattern.search(os.path.basename(name))
+        return int(m.group(1)) if m else -1
+    names = [n for n in names if version(n) >= 0]
+    return max(names, key=version) if names else None
+
+
+def sqlite_path():
+    """Return the newest local MyVideos<N>.db, or None."""
+    base = xbmcvfs.translatePath("special://database/")
+    return _newest(glob.glob(os.path.join(base, "MyVideos*.db")))
+
+
+def connect_sqlite():
+    path = sqlite_path()
+    if not path:
+        raise RuntimeError("no MyVideos*.db in special://database/")
+    # mode=ro: Kodi owns the database, never write to it
+    return sqlite3.connect("file:" + path + "?mode=ro", uri=True), "sqlite"
+
+
+def _mysql_driver():
+    try:
+        import pymysql  # type: ignore
+        return pymysql
+    except ImportError:
+        pass
+    try:
+        import mysql.connector  # type: ignore
+        return mysql.connector
+    except ImportError:
+        raise RuntimeError("no MySQL driver (pymysql or mysql.connector) available")
+
+
+def connect_mysql():
+    """Connect with the credentials stored by the Libretto setup addon."""
+    setup = xbmcaddon.Addon(SETUP_ADDON_ID)
+    host = setup.getSetting("db_host")
+    if not host:
+        raise RuntimeError(f"{SETUP_ADDON_ID} has no database host configured")
+    driver = _mysql_driver()
+    conn = driver.connect(host=host, port=int(setup.getSetting("db_port") or 3306),
+                          user=setup.getSetting("db_user"), password=setup.getSetting("db_pass"),
+                          connect_timeout=5)
+    cur = conn.cursor()
+    # Kodi appends the schema version to the configured name (MyVideos -> MyVideos131)
+    base = setup.getSetting("videos_base") or "MyVideos"
+    cur.execute("SHOW DATABASES LIKE %s", (base + "%",))
+    name = _newest([row[0] for row in cur.fetchall()], base)
+    if not name:
+        conn.close()
+        raise RuntimeError(f"no {base}<N> database on {host}")
+    cur.execute(f"USE `{name}`")
+    cur.execute("SET SESSION TRANSACTION READ ONLY")
+    cur.close()
+    return conn, "mysql"
+
+
+def connect():
+    return connect_mysql() if backend() == BACKEND_MYSQL else connect_sqlite()
+
+
+def wrap_image(url):
+    """Return Kodi's image:// form of a raw art URL, as JSON-RPC reports it."""
+    if not url or url.startswith("image://"):
+        return url or ""
+    # CURL::Encode keeps alphanumerics and -_.!() and uses lowercase hex
+    out = []
+    for b in url.encode("utf-8"):
+        c = chr(b)
+        out.append(c if (c.isascii() and c.isalnum()) or c in "-_.!()" else "%%%02x" % b)
+    return "image://" + "".join(out) + "/"
+
+
+def episode_dict(row):
+    """Map one result row to the JSON-RPC episode dict (EPISODE_PROPS + episodeid/label)."""
+    (eid, title, season, episode, sid, showtitle, playcount, lastplayed, dateadded,
+     path, filename, runtime, position, total, thumb, fanart, poster) = row
+    filename = filename or ""
+    art = {}
+    if thumb:
+        art["thumb"] = wrap_image(thumb)
+    if fanart:
+        art["fanart"] = art["tvshow.fanart"] = wrap_image(fanart)
+    if poster:
+        art["tvshow.poster"] = wrap_image(poster)
+    title = title or ""
+    return {
+        "episodeid": int(eid), "label": title, "title": title,
+        "season": int(season or 0), "episode": int(episode or 0),
+        "showtitle": showtitle or "", "tvshowid": int(sid),
+        "playcount": int(playcount or 0),
+        # stack:// and plugin entries keep the full path in strFileName
+        "file": filename if "://" in filename else (path or "") + filename,
+        "runtime": int(float(runtime or 0)),
+        "art": art,
+        "dateadded": str(dateadded or ""), "lastplayed": str(lastplayed or ""),
+        "resume": {"position": float(position or 0), "total": float(total or 0)},
+    }
+
+
+def fetch_candidates(conn, dialect):
+    """Run the windowed query. Returns ({kind: {tvshowid(str): ep}}, started tvshowids)."""
+    cur = conn.cursor()
+    cur.execute(CANDIDATES_SQL.format(cols=EPISODE_COLS, int=INT_TYPE[dialect]))
+    found = {"inprogress": {}, "next": {}, "next_regular": {}}
+    started = set()
+    for row in cur.fetchall():
+        kind, started_flag = row[0], row[15]
+        ep = episode_dict(row[1:15] + row[17:20])
+        sid = str(ep["tvshowid"])
+        found[kind][sid] = ep
+        if started_flag:
+            started.add(sid)
+    cur.close()
+    return found, started
+
+
+def build_shows():
+    """Return the nextup.build_shows() dict for every show, or None to fall back to JSON-RPC."""
+    t = time.perf_counter()
+    conn = None
+    try:
+        conn, dialect = connect()
+        found, started = fetch_candidates(conn, dialect)
+    except Exception as e:
+        _failed["until"] = time.time() + RETRY_SECONDS
+        log(f"SQL next-up unavailable, using JSON-RPC: {e}")
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+    # Fully watched shows have no "next" row and drop out unless one is being rewatched
+    shows = {}
+    for sid in set(found["inprogress"]) | set(found["next"]):
+        shows[sid] = {
+            "inprogress": found["inprogress"].get(sid),
+            "next": found["next"].get(sid),
+            "next_regular": found["next_regular"].get(sid),
+            "started": sid in started,
+        }
+    elapsed = time.perf_counter() - t
+    diagnostics.record("rpc", f"SQL: {dialect}", elapsed, items=len(shows))
+    log(f"next-up via SQL ({dialect}): {len(shows)} shows in {elapsed * 1000:.0f} ms")
+    return shows
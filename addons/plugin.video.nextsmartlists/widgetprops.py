@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Publish each profile's listing as home-window properties.
+
+With the "publish_properties" setting on, the service writes the first
+"publish_items" episodes of every profile to Window(10000):
+
+    NextSmart.<profile>.Count
+    NextSmart.<profile>.Name
+    NextSmart.<profile>.<n>.Label / .Title / .TVShowTitle / .Season / .Episode
+    NextSmart.<profile>.<n>.Thumb / .Fanart / .File / .Progress / .EpisodeID
+
+n counts from 1. A skin binds static list items to these properties and
+plays .File on click (PlayMedia, or RunPlugin when it is the plugin's play
+action, as with "prequeue_next" on), so showing the widget starts no
+plugin invocation.
+Properties of a profile are only rewritten when its items changed.
+"""
+import hashlib, json
+import xbmcgui  # type: ignore
+
+from library import ADDON, setting, log
+from listing import load_profiles, top_items, episode_label, resume_percent
+import prequeue
+
+HOME_WINDOW = 10000
+PREFIX = "NextSmart"
+DEFAULT_ITEMS = 10
+ITEM_FIELDS = ("Label", "Title", "TVShowTitle", "Season", "Episode", "Thumb", "Fanart",
+               "File", "Progress", "EpisodeID")
+
+
+def enabled():
+    return setting("publish_properties") == "true"
+
+
+def items_per_profile():
+    try:
+        return max(1, int(setting("publish_items") or DEFAULT_ITEMS))
+    except ValueError:
+        return DEFAULT_ITEMS
+
+
+def play_url(ep):
+    if not prequeue.enabled() and ep.get("file"):
+        return ep["file"]
+    return f"plugin://{ADDON.getAddonInfo('id')}/?action=play&episodeid={ep.get('episodeid', 0)}"
+
+
+def item_properties(ep):
+    """Property suffix -> value for one episode."""
+    art = ep.get("art") or {}
+    return {
+        "Label": episode_label(ep),
+        "Title": ep.get("title", ""),
+        "TVShowTitle": ep.get("showtitle", ""),
+        "Season": str(int(ep.get("season", 0))),
+        "Episode": str(int(ep.get("episode", 0))),
+        "Thumb": art.get("thumb", ""),
+        "Fanart": art.get("fanart", ""),
+        "File": play_url(ep),
+        "Progress": str(resume_percent(ep)),
+        "EpisodeID": str(int(ep.get("episodeid", 0))),
+    }
+
+
+def profile_properties(key, cfg, eps):
+    """All properties of one profile as {name: value}."""
+    props = {f"{PREFIX}.{key}.Count": str(len(eps)), f"{PREFIX}.{key}.Name": cfg.get("name", key)}
+    for n, ep in enumerate(eps, 1):
+        for field, value in item_properties(ep).items():
+            props[f"{PREFIX}.{key}.{n}.{field}"] = value
+    return props
+
+
+class PropertyPublisher(object):
+    """Keeps Window(10000) in sync with the profiles' listings; remembers what it set."""
+
+    def __init__(self, window=None):
+        self.window = window or xbmcgui.Window(HOME_WINDOW)
+        self.published = {}   # profile key -> (digest, property names)
+
+    def publish(self):
+        """Recompute every profile and rewrite the ones that changed. Returns the changed keys."""
+        profiles = load_profiles()
+        limit = items_per_profile()
+        changed = []
+        for key, cfg in profiles.items():
+            eps = top_items(cfg, limit)
+            props = profile_properties(key, cfg, eps)
+            digest = hashlib.md5(json.dumps(props, sort_keys=True).encode("utf-8")).hexdigest()
+            if self.published.get(key, (None,))[0] == digest:
+                continue
+            self._apply(key, props)
+            self.published[key] = (digest, set(props))
+            changed.append(key)
+        for key in set(self.published) - set(profiles):
+            self.clear(key)
+            changed.append(key)
+        if changed:
+            log(f"window properties updated for: {', '.join(sorted(changed))}")
+        return changed
+
+    def listed_episodes(self):
+        """Return {episodeid: profile_key} of the published items."""
+        listed = {}
+        for key, (_, names) in self.published.items():
+            for name in names:
+                if name.endswith(".EpisodeID"):
+                    listed.setdefault(int(self.window.getProperty(name) or 0), key)
+        return listed
+
+    def _apply(self, key, props):
+        old = self.published.get(key, (None, set()))[1]
+        for name in old - set(props):
+            self.window.clearProperty(name)
+        for name, value in props.items():
+            self.window.setProperty(name, value)
+
+    def clear(self, key=None):
+        """Remove the properties of one profile, or of all when key is None."""
+        for k in ([key] if key is not None else list(self.published)):
+            for name in self.published.pop(k, (None, set()))[1]:
+                self.window.clearProperty(name)
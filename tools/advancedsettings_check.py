@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Check the advancedsettings.xml merge of plugin.program.libretto.setup on fixture files.
+
+Merges the settings the setup addon writes into every XML file in
+tools/fixtures/advancedsettings (and into an empty file) and checks that
+
+    - nodes the addon does not manage survive unchanged,
+    - the managed nodes carry the new values,
+    - the "Auto" cache preset keeps an existing <cache> section,
+    - changed passwords are marked in the masked diff,
+    - merging a second time changes nothing,
+    - malformed files and other root elements are refused.
+
+    python tools/advancedsettings_check.py            # check all fixtures
+    python tools/advancedsettings_check.py --diff     # also print each diff
+    python tools/advancedsettings_check.py --ram 2048 # pick the cache preset for 2 GB
+
+Exit status 1 if any check fails.
+"""
+import argparse
+import glob
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(HERE, os.pardir, "addons", "plugin.program.libretto.setup")
+FIXTURES = os.path.join(HERE, "fixtures", "advancedsettings")
+sys.path.insert(0, os.path.abspath(ADDON_DIR))
+
+import advsettings  # noqa: E402
+
+# Files that must be refused instead of merged
+INVALID = ("broken.xml", "wrong_root.xml")
+
+
+def sample_updates(ram_mb, text=""):
+    # Same rule as the addon's "Auto" preset: a <cache> already in the file stays
+    cache = None
+    if not advsettings.has_section(text, "cache"):
+        _, cache = advsettings.cache_preset(ram_mb)
+    return advsettings.build_updates(
+        db={"video": advsettings.db_section("nas.lan", "3306", "kodi", "secret", "MyVideos"),
+            "music": advsettings.db_section("nas.lan", "3306", "kodi", "secret", "MyMusic")},
+        videolibrary={"importwatchedstate": True, "importresumepoint": False},
+        cache=cache,
+        timeouts=advsettings.NETWORK_TIMEOUTS,
+    )
+
+
+def leaves(elem, path=""):
+    """{path: text} of every leaf element, plus attributes and comments."""
+    out = {}
+    for i, child in enumerate(elem):
+        if not isinstance(child.tag, str):
+            out[f"{path}/comment()[{i}]"] = (child.text or "").strip()
+            continue
+        p = f"{path}/{child.tag}"
+        for k, v in child.attrib.items():
+            out[f"{p}/@{k}"] = v
+        if len(child):
+            out.update(leaves(child, p))
+        else:
+            out[p] = (child.text or "").strip()
+    return out
+
+
+def flatten(updates, path=""):
+    out = {}
+    for tag, value in updates.items():
+        if isinstance(value, dict):
+            out.update(flatten(value, f"{path}/{tag}"))
+        else:
+            out[f"{path}/{tag}"] = advsettings._text(value)
+    return out
+
+
+def parse(text):
+    return advsettings._parse(text) if text.strip() else ET.Element("advancedsettings")
+
+
+def check(name, text, ram_mb, show_diff):
+    problems = []
+    updates = sample_updates(ram_mb, text)
+    try:
+        merged = advsettings.merge(text, updates)
+    except ValueError as e:
+        if name in INVALID:
+            print(f"{name}: refused as expected ({e})")
+            return 0
+        print(f"{name}: FAILED, merge raised {e}")
+        return 1
+    if name in INVALID:
+        print(f"{name}: FAILED, invalid file was merged")
+        return 1
+
+    wanted = flatten(updates)
+    before = leaves(parse(text))
+    after = leaves(parse(merged))
+    # Comment positions shift when nodes are added; compare their texts only
+    comments = lambda d: sorted(v for k, v in d.items() if "comment()" in k)
+    if comments(before) != comments(after):
+        problems.append("comments changed")
+    for path, value in before.items():
+        if "comment()" in path or path in wanted:
+            continue
+        if after.get(path) != value:
+            problems.append(f"unmanaged {path}: {value!r} -> {after.get(path)!r}")
+    for path, value in wanted.items():
+        if after.get(path) != value:
+            problems.append(f"managed {path}: expected {value!r}, got {after.get(path)!r}")
+    if advsettings.merge(merged, updates) != merged:
+        problems.append("second merge is not a no-op")
+
+    changed = advsettings.diff(text, merged, name)
+    masked = advsettings.mask_passwords(changed)
+    if "<pass>secret</pass>" in masked:
+        problems.append("password shown in the masked diff")
+    pass_changed = before.get("/videodatabase/pass") not in (None, "secret")
+    if pass_changed != ("password changed" in masked):
+        problems.append("changed password not marked" if pass_changed else "unchanged password marked")
+    lines = sum(1 for ln in changed.splitlines() if ln[:1] in "+-" and ln[:3] not in ("+++", "---"))
+    status = "ok" if not problems else "FAILED"
+    print(f"{name}: {status}, {lines} changed lines")
+    for p in problems:
+        print(f"  {p}")
+    if show_diff and changed:
+        print(masked)
+    return 1 if problems else 0
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--ram", type=int, default=4096, help="RAM in MB for the cache preset (default 4096)")
+    ap.add_argument("--diff", action="store_true", help="print the diff of every merge")
+    args = ap.parse_args()
+    preset, cache = advsettings.cache_preset(args.ram)
+    print(f"cache preset for {args.ram} MB: {preset} {cache}")
+    failures = check("(no file)", "", args.ram, args.diff)
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.xml"))):
+        with open(path, "r", encoding="utf-8") as f:
+            failures += check(os.path.basename(path), f.read(), args.ram, args.diff)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Benchmark plugin.video.nextsmartlists outside Kodi.
+
+Runs the plugin against the fake runtime in tools/kodistub with a synthetic
+library and reports, per scenario, wall time (and the part of it spent inside
+the fake JSON-RPC server), JSON-RPC calls/requests, bytes of JSON exchanged and
+peak Python memory (traced, so it includes the fake server's allocations):
+
+    python tools/bench_nextsmart.py --shows 5000 --episodes 300000
+
+Every run starts cold: in-process memos, the listing cache, snapshots and
+(unless the scenario needs it) the Next-Up index are cleared first.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(HERE, os.pardir, "addons", "plugin.video.nextsmartlists")
+sys.path.insert(0, os.path.join(HERE, "kodistub"))
+sys.path.insert(0, os.path.abspath(ADDON_DIR))
+
+import fakekodi  # noqa: E402
+
+ADDON_ID = "plugin.video.nextsmartlists"
+PROFILES = {
+    "all": {"name": "All shows", "skip_specials": True, "inprogress_only": False,
+            "order_by_recent": True, "filter_mode": "all", "filter_shows": []},
+    "inprogress": {"name": "In progress", "skip_specials": True, "inprogress_only": True,
+                   "order_by_recent": True, "filter_mode": "all", "filter_shows": [], "max_items": 20},
+}
+
+
+def profile_dir():
+    return fakekodi.translate(f"special://profile/addon_data/{ADDON_ID}/")
+
+
+def reset_profile_dir(keep_index=False):
+    pdir = profile_dir()
+    for name in ("listings", "snapshots"):
+        shutil.rmtree(os.path.join(pdir, name), ignore_errors=True)
+    if not keep_index:
+        for name in os.listdir(pdir):
+            if name.startswith("nextup_index"):
+                os.remove(os.path.join(pdir, name))
+
+
+def setup(args):
+    fakekodi.STATE["addon_id"] = ADDON_ID
+    fakekodi.STATE["addon_path"] = os.path.abspath(ADDON_DIR)
+    t = time.perf_counter()
+    fakekodi.STATE["library"] = fakekodi.Library(shows=args.shows, episodes=args.episodes, seed=args.seed)
+    lib = fakekodi.STATE["library"]
+    print(f"library: {len(lib.tvshows)} shows, {len(lib.episodes)} episodes "
+          f"(generated in {time.perf_counter() - t:.1f}s)")
+    os.makedirs(profile_dir(), exist_ok=True)
+    with open(os.path.join(profile_dir(), "profiles.json"), "w", encoding="utf-8") as f:
+        json.dump(PROFILES, f)
+    import plugin
+    return plugin
+
+
+def build_index():
+    import nextup
+    nextup.rebuild_index()
+
+
+def scenarios(plugin):
+    inv = plugin.Invocation([f"plugin://{ADDON_ID}/", "1", ""])
+    return {
+        "browse-live": (lambda: plugin.browse_profile(inv, "all"), False),
+        "browse-index": (lambda: plugin.browse_profile(inv, "all"), True),
+        "browse-inprogress": (lambda: plugin.browse_profile(inv, "inprogress"), False),
+        "list_profiles": (lambda: plugin.list_profiles(inv), False),
+        "pick_shows": (lambda: plugin.pick_shows_multiselect([]), False),
+    }
+
+
+def measure(fn, keep_index):
+    import library
+    library.invalidate_memo()
+    reset_profile_dir(keep_index)
+    if keep_index:
+        build_index()
+    fakekodi.reset_stats()
+    tracemalloc.start()
+    t = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = fakekodi.STATE["stats"]
+    return {"wall": wall, "rpc": stats["rpc_time"], "calls": stats["calls"], "requests": stats["requests"],
+            "bytes": stats["bytes_out"] + stats["bytes_in"], "peak": peak,
+            "items": len(fakekodi.STATE["directory"])}
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--shows", type=int, default=1000)
+    ap.add_argument("--episodes", type=int, default=None, help="library total (default: 30 per show)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=3, help="runs per scenario, the best one is reported")
+    ap.add_argument("--scenario", action="append", help="run only these scenarios")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    plugin = setup(args)
+    selected = scenarios(plugin)
+    if args.scenario:
+        selected = {k: v for k, v in selected.items() if k in args.scenario}
+
+    results = {}
+    for name, (fn, keep_index) in selected.items():
+        runs = [measure(fn, keep_index) for _ in range(max(1, args.repeat))]
+        results[name] = min(runs, key=lambda r: r["wall"])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<20}{'wall ms':>10}{'rpc ms':>10}{'calls':>8}{'reqs':>6}{'JSON KiB':>11}{'peak KiB':>11}{'items':>7}")
+    for name, r in results.items():
+        print(f"{name:<20}{r['wall'] * 1000:>10.1f}{r['rpc'] * 1000:>10.1f}{r['calls']:>8}{r['requests']:>6}"
+              f"{r['bytes'] / 1024:>11.0f}{r['peak'] / 1024:>11.0f}{r['items']:>7}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Run the libretto.setup database probe against a local stand-in MySQL server.
+
+The stand-in accepts TCP connections and answers like MariaDB's handshake
+(a protocol 10 greeting), optionally after a delay, with an error packet
+or not at all:
+
+    python tools/dbprobe_check.py                 # all scenarios, checked
+    python tools/dbprobe_check.py --serve 3307    # only run the stand-in
+
+The scenarios check the measured values, the warning thresholds and the
+error reporting of dbprobe.run(); exit status 1 if one fails.
+"""
+import argparse
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(HERE, os.pardir, "addons", "plugin.program.libretto.setup")
+sys.path.insert(0, os.path.abspath(ADDON_DIR))
+
+import dbprobe  # noqa: E402
+
+SERVER_VERSION = b"10.11.6-MariaDB-standin"
+
+
+def packet(payload, seq=0):
+    return struct.pack("<I", len(payload))[:3] + bytes([seq]) + payload
+
+
+def greeting():
+    # Protocol 10, version, thread id, scramble part 1 and filler; enough for the probe
+    return packet(b"\x0a" + SERVER_VERSION + b"\0" + struct.pack("<I", 1) + b"12345678\0")
+
+
+def error_packet(message):
+    return packet(b"\xff" + struct.pack("<H", 1130) + b"#HY000" + message.encode("utf-8"))
+
+
+class StandIn(socketserver.ThreadingTCPServer):
+    """mode: "greeting", "error" or "silent"; delay in seconds before answering."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, mode="greeting", delay=0.0):
+        self.mode, self.delay = mode, delay
+        socketserver.ThreadingTCPServer.__init__(self, ("127.0.0.1", port), Handler)
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        srv = self.server
+        if srv.mode == "silent":
+            time.sleep(2)
+            return
+        time.sleep(srv.delay)
+        self.request.sendall(greeting() if srv.mode == "greeting" else
+                             error_packet("Host '127.0.0.1' is not allowed to connect to this MariaDB server"))
+
+
+def start(mode="greeting", delay=0.0):
+    srv = StandIn(mode=mode, delay=delay)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def scenarios():
+    """(name, server kwargs or None for a closed port, probe kwargs, check(result, warnings))."""
+    return [
+        ("fast server", {}, {},
+         lambda r, w: r["error"] is None and r["pings"] == 5 and r["server"] == SERVER_VERSION.decode()
+         and r["rtt_ms"] < dbprobe.WARN_RTT_MS and not w),
+        ("slow greeting", {"delay": 0.03}, {"pings": 3},
+         lambda r, w: r["rtt_ms"] >= 30 and any("round trip" in x for x in w)),
+        ("error packet", {"mode": "error"}, {},
+         lambda r, w: r["error"] and "not allowed" in r["error"] and r["connect_ms"] is None),
+        ("no greeting", {"mode": "silent"}, {"timeout": 0.3, "pings": 1},
+         lambda r, w: r["error"] and "greeting" in r["error"]),
+        ("closed port", None, {"pings": 1},
+         lambda r, w: r["error"] and "cannot connect" in r["error"]),
+    ]
+
+
+def check_all():
+    failures = 0
+    for name, server, kwargs, ok in scenarios():
+        srv = start(**server) if server is not None else None
+        port = srv.server_address[1] if srv else free_port()
+        try:
+            res = dbprobe.run("127.0.0.1", port, query=False, **kwargs)
+        finally:
+            if srv:
+                srv.shutdown()
+                srv.server_close()
+        warn = dbprobe.warnings(res)
+        passed = bool(ok(res, warn))
+        failures += not passed
+        print(f"{name}: {'ok' if passed else 'FAILED'} - {dbprobe.summary(res)}"
+              + (f" [warnings: {'; '.join(warn)}]" if warn else ""))
+    return failures
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--serve", type=int, metavar="PORT", help="only run the stand-in on PORT")
+    ap.add_argument("--mode", choices=("greeting", "error", "silent"), default="greeting")
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds before the greeting")
+    args = ap.parse_args()
+    if args.serve is not None:
+        srv = StandIn(args.serve, args.mode, args.delay)
+        print(f"stand-in on 127.0.0.1:{srv.server_address[1]} ({args.mode}, delay {args.delay}s)")
+        srv.serve_forever()
+        return
+    sys.exit(1 if check_all() else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
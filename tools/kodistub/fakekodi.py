@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""State behind the fake xbmc* modules.
+
+Put this directory first on sys.path and the addons import xbmc, xbmcgui,
+xbmcplugin, xbmcaddon and xbmcvfs from here. STATE holds the synthetic
+library, addon settings, the rendered directory and the JSON-RPC counters the
+benchmark reads back.
+"""
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+STATE = {
+    "library": None,
+    "root": None,
+    "settings": {},
+    "addon_id": "plugin.video.nextsmartlists",
+    "addon_path": "",
+    "directory": [],
+    "ended": [],
+    "builtins": [],
+    "window": {},
+    "playing": False,
+    "playlist": [],
+    "position": -1,     # playlist position of the playing item, -1 = not from a playlist
+    "textures": set(),
+    "stats": None,
+}
+
+
+def reset_stats():
+    STATE["stats"] = {"calls": 0, "requests": 0, "bytes_out": 0, "bytes_in": 0, "rpc_time": 0.0,
+                      "methods": {}}
+    STATE["directory"] = []
+    STATE["ended"] = []
+    STATE["builtins"] = []
+
+
+reset_stats()
+
+
+def root_dir():
+    if STATE["root"] is None:
+        STATE["root"] = tempfile.mkdtemp(prefix="kodistub-")
+    return STATE["root"]
+
+
+def translate(path):
+    path = str(path)
+    if not path.startswith("special://"):
+        return path
+    parts = [p for p in path[len("special://"):].split("/") if p]
+    out = os.path.join(root_dir(), *parts)
+    return out + os.sep if path.endswith("/") else out
+
+
+# ---------------- Synthetic library ----------------
+
+EPOCH = datetime.datetime(2020, 1, 1)
+
+
+def _ts(seconds):
+    return (EPOCH + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Library(object):
+    """In-memory video library answering the VideoLibrary.* subset nextsmartlists uses.
+
+    shows/episodes set the size (episodes is the library total, spread
+    unevenly over the shows); started/finished/inprogress/specials are the
+    fractions of shows in each watch state.
+    """
+
+    def __init__(self, shows=200, episodes=None, started=0.3, finished=0.1,
+                 inprogress=0.3, specials=0.2, seed=1):
+        rnd = random.Random(seed)
+        per_show = float(episodes) / shows if episodes else 30.0
+        self.tvshows = []
+        self.episodes = []
+        self.eps_by_show = {}
+        eid = 1
+        for sid in range(1, shows + 1):
+            title = "Show %05d" % sid
+            base = sid * 3600
+            self.tvshows.append({
+                "tvshowid": sid, "title": title, "dateadded": _ts(base),
+                "art": {"poster": "image://poster/%d.jpg/" % sid, "fanart": "image://fanart/%d.jpg/" % sid},
+            })
+            count = max(1, int(rnd.uniform(0.5, 1.5) * per_show))
+            numbers = [(0, n) for n in range(1, 3)] if rnd.random() < specials else []
+            season_len = rnd.randint(6, 14)
+            numbers += [(i // season_len + 1, i % season_len + 1) for i in range(count)]
+            roll = rnd.random()
+            if roll < finished:
+                watched = len(numbers)
+            elif roll < finished + started:
+                watched = rnd.randint(1, max(1, len(numbers) - 1))
+            else:
+                watched = 0
+            # Specials sort last: they are watched after the regular episodes
+            order = sorted(numbers, key=lambda x: (x[0] == 0, x))
+            show_eps = []
+            for idx, (s, n) in enumerate(order):
+                played = idx < watched
+                ep = {
+                    "episodeid": eid, "tvshowid": sid, "showtitle": title,
+                    "title": "Episode %d" % n, "season": s, "episode": n,
+                    "playcount": 1 if played else 0,
+                    "lastplayed": _ts(base + idx * 60) if played else "",
+                    "dateadded": _ts(base + idx),
+                    "file": "nfs://nas/tv/%s/S%02dE%02d.mkv" % (title, s, n),
+                    "runtime": 2400,
+                    "art": {"thumb": "image://thumb/%d.jpg/" % eid, "fanart": "image://fanart/%d.jpg/" % sid},
+                    "resume": {"position": 0.0, "total": 0.0},
+                }
+                if idx == watched and watched and rnd.random() < inprogress:
+                    ep["resume"] = {"position": 600.0, "total": 2400.0}
+                    ep["lastplayed"] = _ts(base + idx * 60 + 30)
+                show_eps.append(ep)
+                eid += 1
+            self.episodes.extend(show_eps)
+            self.eps_by_show[sid] = show_eps
+        self.by_id = {e["episodeid"]: e for e in self.episodes}
+
+    # ----- query helpers -----
+    def _match(self, item, f):
+        if not f:
+            return True
+        if "and" in f:
+            return all(self._match(item, x) for x in f["and"])
+        if "or" in f:
+            return any(self._match(item, x) for x in f["or"])
+        field, op, val = f.get("field"), f.get("operator"), f.get("value")
+        if field == "inprogress":
+            inp = float((item.get("resume") or {}).get("position", 0)) > 0
+            return inp if op == "true" else not inp
+        # Filter field names of the TV show aggregates differ from their property names
+        field = {"numwatched": "watchedepisodes", "numepisodes": "episode"}.get(field, field)
+        cur = item.get("showtitle") if field == "tvshow" else item.get(field)
+        if field in ("playcount", "season", "episode", "watchedepisodes"):
+            cur, val = int(cur or 0), int(val or 0)
+        else:
+            cur, val = str(cur or ""), str(val or "")
+        if op == "is":
+            return cur == val
+        if op == "isnot":
+            return cur != val
+        if op in ("greaterthan", "after"):
+            return cur > val
+        if op in ("lessthan", "before"):
+            return cur < val
+        if op == "startswith":
+            return cur.lower().startswith(val.lower())
+        if op == "contains":
+            return val.lower() in cur.lower()
+        raise ValueError("unsupported operator %s" % op)
+
+    @staticmethod
+    def _sort(items, sort):
+        method = (sort or {}).get("method", "none")
+        if method == "episode":
+            key = lambda e: (e.get("season", 0), e.get("episode", 0))
+        elif method in ("lastplayed", "dateadded", "title", "label", "tvshowtitle"):
+            field = {"label": "title", "tvshowtitle": "showtitle"}.get(method, method)
+            key = lambda e: e.get(field) or ""
+        else:
+            return items
+        return sorted(items, key=key, reverse=sort.get("order") == "descending")
+
+    @staticmethod
+    def _slice(items, limits):
+        total = len(items)
+        start = int((limits or {}).get("start", 0))
+        end = int((limits or {}).get("end", -1))
+        if end < 0:
+            end = total
+        return items[start:end], {"start": start, "end": min(end, total), "total": total}
+
+    @staticmethod
+    def _project(item, props, idkey):
+        out = {idkey: item[idkey], "label": item.get("title", "")}
+        for p in props or []:
+            if p in item:
+                out[p] = item[p]
+        return out
+
+    def _show_view(self, show):
+        eps = self.eps_by_show.get(show["tvshowid"], [])
+        view = dict(show)
+        view["episode"] = len(eps)
+        view["watchedepisodes"] = sum(1 for e in eps if e["playcount"] > 0)
+        view["lastplayed"] = max([e["lastplayed"] for e in eps] or [""])
+        view["playcount"] = 1 if eps and view["watchedepisodes"] == len(eps) else 0
+        view["season"] = len({e["season"] for e in eps})
+        return view
+
+    # ----- JSON-RPC -----
+    def call(self, method, params):
+        params = params or {}
+        if method == "VideoLibrary.GetEpisodes":
+            if "tvshowid" in params:
+                eps = self.eps_by_show.get(int(params["tvshowid"]), [])
+                if "season" in params:
+                    eps = [e for e in eps if e["season"] == int(params["season"])]
+            else:
+                eps = self.episodes
+            eps = [e for e in eps if self._match(e, params.get("filter"))]
+            eps, limits = self._slice(self._sort(eps, params.get("sort")), params.get("limits"))
+            return {"episodes": [self._project(e, params.get("properties"), "episodeid") for e in eps],
+                    "limits": limits}
+        if method == "VideoLibrary.GetRecentlyAddedEpisodes":
+            eps = self._sort(self.episodes, {"method": "dateadded", "order": "descending"})
+            eps, limits = self._slice(eps, params.get("limits"))
+            return {"episodes": [self._project(e, params.get("properties"), "episodeid") for e in eps],
+                    "limits": limits}
+        if method == "VideoLibrary.GetEpisodeDetails":
+            ep = self.by_id.get(int(params["episodeid"]))
+            if ep is None:
+                raise KeyError("episodeid %s" % params["episodeid"])
+            return {"episodedetails": self._project(ep, params.get("properties"), "episodeid")}
+        if method == "VideoLibrary.GetTVShows":
+            props = params.get("properties") or []
+            views = [self._show_view(s) for s in self.tvshows]
+            shows = [s for s in views if self._match(s, params.get("filter"))]
+            shows, limits = self._slice(self._sort(shows, params.get("sort")), params.get("limits"))
+            return {"tvshows": [self._project(s, props, "tvshowid") for s in shows], "limits": limits}
+        if method == "Player.Open":
+            item = params.get("item") or {}
+            STATE["playing"] = True
+            STATE["position"] = int(item.get("position", 0)) if "playlistid" in item else -1
+            return "OK"
+        if method == "Player.GetActivePlayers":
+            return [{"playerid": 1, "type": "video"}] if STATE["playing"] else []
+        if method == "Player.GetProperties":
+            return {"playlistid": 1 if STATE["position"] >= 0 else -1,
+                    "position": STATE["position"] if STATE["playing"] else -1}
+        if method == "Playlist.Clear":
+            del STATE["playlist"][:]
+            return "OK"
+        if method == "Playlist.Add":
+            STATE["playlist"].append(params.get("item"))
+            return "OK"
+        if method == "Playlist.Insert":
+            STATE["playlist"].insert(int(params.get("position", len(STATE["playlist"]))), params.get("item"))
+            return "OK"
+        if method == "Playlist.GetProperties":
+            return {"size": len(STATE["playlist"])}
+        if method == "Playlist.GetItems":
+            return {"items": [dict(i, type="episode", id=i.get("episodeid")) for i in STATE["playlist"]]}
+        if method == "Textures.GetTextures":
+            url = (params.get("filter") or {}).get("value") or ""
+            return {"textures": [{"textureid": 1, "url": url}] if url in STATE["textures"] else []}
+        if method == "Settings.GetSettingValue":
+            return {"value": STATE["settings"].get("kodi", {}).get(params.get("setting"))}
+        if method == "JSONRPC.Ping":
+            return "pong"
+        raise NotImplementedError(method)
+
+
+def execute(request):
+    """xbmc.executeJSONRPC: single requests and JSON-RPC 2.0 batches."""
+    start = time.perf_counter()
+    stats = STATE["stats"]
+    stats["requests"] += 1
+    stats["bytes_out"] += len(request)
+    data = json.loads(request)
+    lib = STATE["library"]
+
+    def one(req):
+        stats["calls"] += 1
+        method = req.get("method")
+        stats["methods"][method] = stats["methods"].get(method, 0) + 1
+        try:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": lib.call(method, req.get("params"))}
+        except NotImplementedError:
+            return {"jsonrpc": "2.0", "id": req.get("id"),
+                    "error": {"code": -32601, "message": "Method not found."}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": req.get("id"),
+                    "error": {"code": -32602, "message": "Invalid params.", "data": str(e)}}
+
+    resp = json.dumps([one(r) for r in data] if isinstance(data, list) else one(data))
+    stats["bytes_in"] += len(resp)
+    stats["rpc_time"] += time.perf_counter() - start
+    return resp
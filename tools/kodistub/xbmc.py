@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Fake xbmc: logging, JSON-RPC through fakekodi, Monitor and Player stubs."""
+import time
+import fakekodi
+
+LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR = 0, 1, 2, 3
+LOG = []
+VERBOSE = False
+
+
+def log(msg, level=LOGDEBUG):
+    LOG.append(msg)
+    if VERBOSE:
+        print(msg)
+
+
+def executeJSONRPC(request):
+    return fakekodi.execute(request)
+
+
+def executebuiltin(cmd, wait=False):
+    fakekodi.STATE["builtins"].append(cmd)
+
+
+def getInfoLabel(label):
+    return fakekodi.STATE["settings"].get("infolabels", {}).get(label, "")
+
+
+def getCondVisibility(cond):
+    if cond == "Player.HasVideo":
+        return fakekodi.STATE["playing"]
+    return False
+
+
+def sleep(ms):
+    time.sleep(ms / 1000.0)
+
+
+class Monitor(object):
+    def abortRequested(self):
+        return fakekodi.STATE.get("abort", False)
+
+    def waitForAbort(self, timeout=None):
+        if timeout:
+            time.sleep(min(timeout, 0.01))
+        return self.abortRequested()
+
+
+class Player(object):
+    def isPlaying(self):
+        return fakekodi.STATE["playing"]
+
+    def isPlayingVideo(self):
+        return fakekodi.STATE["playing"]
+
+    def getTime(self):
+        return fakekodi.STATE.get("player_time", 0.0)
+
+    def getTotalTime(self):
+        return fakekodi.STATE.get("player_total", 0.0)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Fake xbmcaddon: settings live in fakekodi.STATE["settings"][addon_id]."""
+import fakekodi
+
+
+class Addon(object):
+    def __init__(self, id=None):
+        self.id = id or fakekodi.STATE["addon_id"]
+
+    def getAddonInfo(self, key):
+        if key == "id":
+            return self.id
+        if key == "name":
+            return self.id
+        if key == "profile":
+            return "special://profile/addon_data/%s/" % self.id
+        if key == "path":
+            return fakekodi.STATE["addon_path"]
+        if key == "version":
+            return "0.0.0"
+        return ""
+
+    def _settings(self):
+        return fakekodi.STATE["settings"].setdefault(self.id, {})
+
+    def getSetting(self, key):
+        return str(self._settings().get(key, ""))
+
+    def getSettingBool(self, key):
+        return str(self._settings().get(key, "")).lower() == "true"
+
+    def getSettingInt(self, key):
+        try:
+            return int(self._settings().get(key, 0))
+        except ValueError:
+            return 0
+
+    def setSetting(self, key, value):
+        self._settings()[key] = value
+
+    def getLocalizedString(self, sid):
+        return ""
+
+    def openSettings(self):
+        pass
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Fake xbmcgui: ListItem/InfoTagVideo record what is set, Dialog answers from a queue."""
+import fakekodi
+
+INPUT_ALPHANUM, INPUT_NUMERIC = 0, 1
+NOTIFICATION_INFO, NOTIFICATION_WARNING, NOTIFICATION_ERROR = "info", "warning", "error"
+
+
+class InfoTagVideo(object):
+    def __init__(self):
+        self.data = {}
+
+    def __getattr__(self, name):
+        # Any setXxx(value, ...) is accepted and stored under "xxx"
+        if name.startswith("set"):
+            def setter(value, *args):
+                self.data[name[3:].lower()] = (value,) + args if args else value
+            return setter
+        raise AttributeError(name)
+
+
+class ListItem(object):
+    def __init__(self, label="", label2="", path="", offscreen=False):
+        self.label = label
+        self.label2 = label2
+        self.path = path
+        self.offscreen = offscreen
+        self.props = {}
+        self.art = {}
+        self.info = {}
+        self.tag = InfoTagVideo()
+
+    def getLabel(self):
+        return self.label
+
+    def setLabel(self, label):
+        self.label = label
+
+    def setPath(self, path):
+        self.path = path
+
+    def setProperty(self, key, value):
+        self.props[key.lower()] = value
+
+    def setProperties(self, values):
+        for key, value in values.items():
+            self.setProperty(key, value)
+
+    def getProperty(self, key):
+        return self.props.get(key.lower(), "")
+
+    def setArt(self, art):
+        self.art.update(art)
+
+    def getArt(self, key):
+        return self.art.get(key, "")
+
+    def setInfo(self, kind, info):
+        self.info.update(info)
+
+    def getVideoInfoTag(self):
+        return self.tag
+
+    def setResumeTime(self, pos, tot):
+        self.props["resumetime"] = str(pos)
+        self.props["totaltime"] = str(tot)
+
+
+class Dialog(object):
+    """Answers come from Dialog.answers (FIFO); an empty queue gives the 'cancel' answer."""
+    answers = []
+
+    def _next(self, default):
+        return Dialog.answers.pop(0) if Dialog.answers else default
+
+    def ok(self, *a, **k):
+        return True
+
+    def yesno(self, *a, **k):
+        return self._next(False)
+
+    def input(self, *a, **k):
+        return self._next(k.get("defaultt", ""))
+
+    def select(self, *a, **k):
+        return self._next(-1)
+
+    def multiselect(self, heading, options, preselect=None, **k):
+        fakekodi.STATE["multiselect"] = len(options)
+        return self._next(preselect)
+
+    def notification(self, *a, **k):
+        pass
+
+    def textviewer(self, heading, text, *a, **k):
+        fakekodi.STATE["textviewer"] = text
+
+
+class DialogProgress(object):
+    def create(self, heading, message=""):
+        pass
+
+    def update(self, percent, message=""):
+        pass
+
+    def iscanceled(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class Window(object):
+    def __init__(self, wid=10000):
+        self.props = fakekodi.STATE["window"].setdefault(wid, {})
+
+    def setProperty(self, key, value):
+        self.props[key.lower()] = value
+
+    def getProperty(self, key):
+        return self.props.get(key.lower(), "")
+
+    def clearProperty(self, key):
+        self.props.pop(key.lower(), None)
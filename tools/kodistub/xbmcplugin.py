@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Fake xbmcplugin: directory items are collected in fakekodi.STATE["directory"]."""
+import fakekodi
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    fakekodi.STATE["directory"].append((url, listitem, isFolder))
+    return True
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    fakekodi.STATE["directory"].extend(items)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    fakekodi.STATE["ended"].append({"handle": handle, "cacheToDisc": cacheToDisc})
+
+
+def setContent(handle, content):
+    pass
+
+
+def setResolvedUrl(handle, succeeded, listitem):
+    pass
+
+
+def setPluginCategory(handle, category):
+    pass
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Fake xbmcvfs: special:// paths map into a temporary directory."""
+import os
+import fakekodi
+
+
+def translatePath(path):
+    return fakekodi.translate(path)
+
+
+def exists(path):
+    return os.path.exists(fakekodi.translate(path))
+
+
+def mkdirs(path):
+    os.makedirs(fakekodi.translate(path), exist_ok=True)
+    return True
+
+
+def delete(path):
+    try:
+        os.remove(fakekodi.translate(path))
+        return True
+    except OSError:
+        return False
+
+
+class File(object):
+    def __init__(self, path, mode="r"):
+        self._f = open(fakekodi.translate(path), "wb" if "w" in mode else "rb")
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._f.write(data)
+        return True
+
+    def read(self):
+        return self._f.read().decode("utf-8")
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        self.close()
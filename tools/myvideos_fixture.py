@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Build a MyVideos SQLite fixture from the fake library and check the SQL backend.
+
+Writes the tables and the episode_view columns nextsmartlists' SQL backend
+(sqlnextup.py) reads, filled from the same synthetic library the fake
+JSON-RPC server in tools/kodistub answers from:
+
+    python tools/myvideos_fixture.py --shows 500 --out /tmp/MyVideos131.db
+    python tools/myvideos_fixture.py --shows 500 --compare
+
+--compare puts the fixture into the fake special://database/, builds the
+Next-Up shows once through JSON-RPC and once through SQL and reports every
+show whose candidates differ (exit status 1 if any).
+
+--maintain runs the libretto.setup index advisor (dbmaint.py) on the
+fixture, which carries Kodi's own indexes, creates the missing ones and
+prints the before/after report (exit status 1 if the advisor misses Kodi's
+bookmark index or an index is still missing afterwards):
+
+    python tools/myvideos_fixture.py --shows 2000 --maintain
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(HERE, os.pardir, "addons", "plugin.video.nextsmartlists")
+SETUP_DIR = os.path.join(HERE, os.pardir, "addons", "plugin.program.libretto.setup")
+sys.path.insert(0, os.path.join(HERE, "kodistub"))
+
+import fakekodi  # noqa: E402
+
+ADDON_ID = "plugin.video.nextsmartlists"
+DB_NAME = "MyVideos131.db"
+
+# Subset of Kodi's schema: only the columns episode_view exposes to the backend
+SCHEMA = """
+CREATE TABLE path (idPath INTEGER PRIMARY KEY, strPath TEXT);
+CREATE TABLE files (idFile INTEGER PRIMARY KEY, idPath INTEGER, strFilename TEXT,
+                    playCount INTEGER, lastPlayed TEXT, dateAdded TEXT);
+CREATE TABLE tvshow (idShow INTEGER PRIMARY KEY, c00 TEXT);
+CREATE TABLE seasons (idSeason INTEGER PRIMARY KEY, idShow INTEGER, season INTEGER);
+CREATE TABLE episode (idEpisode INTEGER PRIMARY KEY, idFile INTEGER, c00 TEXT, c09 TEXT,
+                      c12 TEXT, c13 TEXT, idShow INTEGER, idSeason INTEGER);
+CREATE TABLE bookmark (idBookmark INTEGER PRIMARY KEY, idFile INTEGER, timeInSeconds DOUBLE,
+                       totalTimeInSeconds DOUBLE, type INTEGER);
+CREATE TABLE art (art_id INTEGER PRIMARY KEY, media_id INTEGER, media_type TEXT, type TEXT, url TEXT);
+-- Indexes Kodi itself creates on these tables (VideoDatabase::CreateAnalytics)
+CREATE UNIQUE INDEX ix_path ON path (strPath);
+CREATE INDEX ix_files ON files (idPath, strFilename);
+CREATE INDEX ix_seasons ON seasons (idShow, season);
+CREATE INDEX ix_episode_show1 ON episode (idEpisode, idShow);
+CREATE INDEX ix_episode_show2 ON episode (idShow, idEpisode);
+CREATE UNIQUE INDEX ix_episode_file_1 ON episode (idEpisode, idFile);
+CREATE UNIQUE INDEX id_episode_file_2 ON episode (idFile, idEpisode);
+CREATE INDEX ix_episode_season_episode ON episode (c12, c13);
+CREATE INDEX ix_episode_idSeason ON episode (idSeason);
+CREATE INDEX ix_bookmark ON bookmark (idFile, type);
+CREATE INDEX ix_art ON art (media_id, media_type, type);
+CREATE VIEW episode_view AS SELECT
+    episode.*, files.strFileName AS strFileName, path.strPath AS strPath,
+    files.playCount AS playCount, files.lastPlayed AS lastPlayed, files.dateAdded AS dateAdded,
+    tvshow.c00 AS strTitle, seasons.season AS season,
+    bookmark.timeInSeconds AS resumeTimeInSeconds, bookmark.totalTimeInSeconds AS totalTimeInSeconds
+  FROM episode
+  JOIN files ON files.idFile = episode.idFile
+  JOIN tvshow ON tvshow.idShow = episode.idShow
+  JOIN seasons ON seasons.idSeason = episode.idSeason
+  JOIN path ON files.idPath = path.idPath
+  LEFT JOIN bookmark ON bookmark.idFile = episode.idFile AND bookmark.type = 1;
+"""
+
+
+def build_fixture(lib, path):
+    """Write `lib` (a fakekodi.Library) as a MyVideos database at `path`."""
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    paths, seasons = {}, {}
+    for show in lib.tvshows:
+        sid = show["tvshowid"]
+        db.execute("INSERT INTO tvshow VALUES (?, ?)", (sid, show["title"]))
+        for kind, url in show["art"].items():
+            db.execute("INSERT INTO art (media_id, media_type, type, url) VALUES (?, 'tvshow', ?, ?)",
+                       (sid, kind, url))
+    for ep in lib.episodes:
+        eid, sid = ep["episodeid"], ep["tvshowid"]
+        folder, _, filename = ep["file"].rpartition("/")
+        folder += "/"
+        if folder not in paths:
+            paths[folder] = len(paths) + 1
+            db.execute("INSERT INTO path VALUES (?, ?)", (paths[folder], folder))
+        if (sid, ep["season"]) not in seasons:
+            seasons[(sid, ep["season"])] = len(seasons) + 1
+            db.execute("INSERT INTO seasons VALUES (?, ?, ?)", (seasons[(sid, ep["season"])], sid, ep["season"]))
+        # Kodi keeps NULL rather than 0/"" for never played files
+        db.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                   (eid, paths[folder], filename, ep["playcount"] or None, ep["lastplayed"] or None,
+                    ep["dateadded"]))
+        db.execute("INSERT INTO episode VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   (eid, eid, ep["title"], str(ep["runtime"]), str(ep["season"]), str(ep["episode"]),
+                    sid, seasons[(sid, ep["season"])]))
+        if ep["resume"]["position"] > 0:
+            db.execute("INSERT INTO bookmark (idFile, timeInSeconds, totalTimeInSeconds, type) "
+                       "VALUES (?, ?, ?, 1)", (eid, ep["resume"]["position"], ep["resume"]["total"]))
+        db.execute("INSERT INTO art (media_id, media_type, type, url) VALUES (?, 'episode', 'thumb', ?)",
+                   (eid, ep["art"]["thumb"]))
+    db.commit()
+    db.close()
+
+
+def comparable(ep):
+    """Episode dict without the art keys only the SQL backend adds."""
+    if not isinstance(ep, dict):
+        return ep
+    ep = dict(ep)
+    art = ep.pop("art", None) or {}
+    ep["art"] = {k: art.get(k) for k in ("thumb", "fanart")}
+    return ep
+
+
+def compare(args):
+    fakekodi.STATE["addon_id"] = ADDON_ID
+    fakekodi.STATE["addon_path"] = os.path.abspath(ADDON_DIR)
+    lib = fakekodi.STATE["library"] = fakekodi.Library(shows=args.shows, episodes=args.episodes, seed=args.seed)
+    os.makedirs(fakekodi.translate("special://database/"), exist_ok=True)
+    build_fixture(lib, fakekodi.translate("special://database/" + DB_NAME))
+    sys.path.insert(0, os.path.abspath(ADDON_DIR))
+    import nextup
+    settings = fakekodi.STATE["settings"].setdefault(ADDON_ID, {})
+
+    settings["sql_backend"] = "0"
+    t = time.perf_counter()
+    rpc_shows = nextup.build_shows()
+    rpc_ms = (time.perf_counter() - t) * 1000
+    settings["sql_backend"] = "1"
+    t = time.perf_counter()
+    sql_shows = nextup.build_shows()
+    sql_ms = (time.perf_counter() - t) * 1000
+
+    diffs = 0
+    for sid in sorted(set(rpc_shows) | set(sql_shows), key=int):
+        a, b = rpc_shows.get(sid), sql_shows.get(sid)
+        if a is None or b is None:
+            print(f"show {sid}: only in {'SQL' if a is None else 'JSON-RPC'}")
+            diffs += 1
+            continue
+        keys = ["inprogress", "started"]
+        # JSON-RPC skips the Next-Up lookup for shows with an in-progress episode
+        if not a["inprogress"]:
+            keys += ["next", "next_regular"]
+        for key in keys:
+            if comparable(a[key]) != comparable(b[key]):
+                print(f"show {sid} {key}:\n  json-rpc {a[key]}\n  sql      {b[key]}")
+                diffs += 1
+    print(f"{len(rpc_shows)} shows, {diffs} differences "
+          f"(JSON-RPC {rpc_ms:.0f} ms, SQL {sql_ms:.0f} ms)")
+    return 1 if diffs else 0
+
+
+def maintain(args):
+    sys.path.insert(0, os.path.abspath(SETUP_DIR))
+    import dbmaint
+    path = args.out or os.path.join(fakekodi.root_dir(), DB_NAME)
+    lib = fakekodi.Library(shows=args.shows, episodes=args.episodes, seed=args.seed)
+    build_fixture(lib, path)
+    db = sqlite3.connect(path)
+    try:
+        advice = dbmaint.advise(dbmaint.existing_indexes(db, "sqlite"))
+        stock = ("bookmark", ("idFile", "type"), "ix_bookmark") in advice["present"]
+        before = dbmaint.time_queries(db)
+        executed = dbmaint.apply(db, "sqlite", advice)
+        after = dbmaint.time_queries(db)
+        print(f"{path}: {len(lib.tvshows)} shows, {len(lib.episodes)} episodes\n")
+        print(dbmaint.report(advice, before, after, executed))
+        left = dbmaint.advise(dbmaint.existing_indexes(db, "sqlite"))["missing"]
+    finally:
+        db.close()
+    if not stock:
+        print("\nKodi's ix_bookmark (idFile, type) was not reported as present")
+    if left:
+        print(f"\nstill missing after apply: {left}")
+    return 1 if left or not stock else 0
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--shows", type=int, default=200)
+    ap.add_argument("--episodes", type=int, default=None, help="library total (default: 30 per show)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the fixture here")
+    ap.add_argument("--compare", action="store_true", help="compare the SQL backend with JSON-RPC")
+    ap.add_argument("--maintain", action="store_true", help="run the libretto.setup index advisor on the fixture")
+    args = ap.parse_args()
+    if args.compare:
+        sys.exit(compare(args))
+    if args.maintain:
+        sys.exit(maintain(args))
+    if not args.out:
+        ap.error("--out, --compare or --maintain is required")
+    lib = fakekodi.Library(shows=args.shows, episodes=args.episodes, seed=args.seed)
+    build_fixture(lib, args.out)
+    print(f"{args.out}: {len(lib.tvshows)} shows, {len(lib.episodes)} episodes")
+
+
+if __name__ == "__main__":
+    main_cli()